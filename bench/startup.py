@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: startup.py
+
+Start-up time benchmark for the commands.
+
+For each command, measures the time taken to import its module and to print
+its help, and compares them against the targets below. Exits with a non-zero
+status if any command is slower than its target, so it can be used to catch
+start-up time regressions. Use --profile to see which imports a command's
+start-up time is spent on.
+
+'''
+
+# $Source$
+
+
+from optparse import OptionParser, OptionError
+import os
+import subprocess
+import sys
+import time
+
+
+# Targets, in seconds: (import the module, run the command with --help)
+TARGETS = {'rtact': (0.10, 0.20),
+           'rtcat': (0.10, 0.20),
+           'rtcon': (0.10, 0.20),
+           'rtconf': (0.10, 0.20),
+           'rtdeact': (0.10, 0.20),
+           'rtdel': (0.10, 0.20),
+           'rtdis': (0.10, 0.20),
+           'rtfind': (0.10, 0.20),
+           'rtinject': (0.10, 0.20),
+           'rtls': (0.10, 0.20),
+           'rtmgr': (0.10, 0.20),
+           'rtprint': (0.10, 0.20),
+           'rtreset': (0.10, 0.20),
+           'rtstart': (0.10, 0.20)}
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TIMER = '''import time
+start = time.time()
+import rtcshell.{0}
+print time.time() - start
+'''
+
+IMPORT_PROFILER = '''import __builtin__, sys, time
+times = {{}}
+real_import = __builtin__.__import__
+def timed_import(name, *args, **kwargs):
+    already = name in sys.modules
+    start = time.time()
+    try:
+        return real_import(name, *args, **kwargs)
+    finally:
+        if not already and name in sys.modules:
+            times[name] = time.time() - start
+__builtin__.__import__ = timed_import
+import rtcshell.{0}
+for name, t in sorted(times.items(), key=lambda x: -x[1])[:{1}]:
+    print '{{0:8.4f}}  {{1}}'.format(t, name)
+'''
+
+
+def get_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([SRC_DIR] + \
+            [p for p in env.get('PYTHONPATH', '').split(os.pathsep) if p])
+    # Measure the commands themselves, not the daemon
+    env['RTCSH_NO_DAEMON'] = '1'
+    return env
+
+
+def time_import(command, env):
+    output = subprocess.Popen([sys.executable, '-c',
+                               IMPORT_TIMER.format(command)],
+                              stdout=subprocess.PIPE, env=env).communicate()[0]
+    return float(output)
+
+
+def time_help(command, env):
+    devnull = open(os.devnull, 'w')
+    try:
+        start = time.time()
+        subprocess.call([sys.executable, os.path.join(SRC_DIR, command),
+                         '--help'], stdout=devnull, stderr=devnull, env=env)
+        return time.time() - start
+    finally:
+        devnull.close()
+
+
+def profile_imports(command, count, env):
+    '''Print the modules that take the longest to import for a command.
+
+    Times include the time taken to import each module's own imports.
+
+    '''
+    return subprocess.call([sys.executable, '-c',
+                            IMPORT_PROFILER.format(command, count)], env=env)
+
+
+def main(argv=None):
+    usage = '''Usage: %prog [options] [command...]
+Measure the start-up time of the commands and compare it against targets.
+
+If no commands are given, all commands are measured. The best of several runs
+is used for each measurement.'''
+    parser = OptionParser(usage=usage)
+    parser.add_option('-n', '--runs', dest='runs', type='int', default=5,
+            help='Number of runs of each measurement. [Default: %default]')
+    parser.add_option('-s', '--scale', dest='scale', type='float',
+            default=1.0, help='Multiply the targets by this value, for \
+slower or faster machines. [Default: %default]')
+    parser.add_option('-p', '--profile', dest='profile', action='store_true',
+            default=False, help='Print the slowest imports of each command \
+instead of comparing against the targets.')
+    parser.add_option('-c', '--count', dest='count', type='int', default=15,
+            help='Number of imports to print with --profile. \
+[Default: %default]')
+
+    if argv:
+        sys.argv = [sys.argv[0]] + argv
+    try:
+        options, args = parser.parse_args()
+    except OptionError, e:
+        print 'OptionError:', e
+        return 1
+
+    commands = args or sorted(TARGETS.keys())
+    for c in commands:
+        if c not in TARGETS:
+            print >>sys.stderr, '{0}: Unknown command: {1}'.format(
+                    sys.argv[0], c)
+            return 1
+    env = get_env()
+
+    if options.profile:
+        for c in commands:
+            print c + ':'
+            profile_imports(c, options.count, env)
+            print
+        return 0
+
+    failed = []
+    print '{0:10}{1:>10}{2:>10}{3:>10}{4:>10}'.format('Command', 'Import',
+            'Target', 'Help', 'Target')
+    for c in commands:
+        import_target, help_target = [t * options.scale for t in TARGETS[c]]
+        import_time = min([time_import(c, env) for ii in range(options.runs)])
+        help_time = min([time_help(c, env) for ii in range(options.runs)])
+        mark = ''
+        if import_time > import_target or help_time > help_target:
+            failed.append(c)
+            mark = '  SLOW'
+        print '{0:10}{1:10.3f}{2:10.3f}{3:10.3f}{4:10.3f}{5}'.format(c,
+                import_time, import_target, help_time, help_target, mark)
+    if failed:
+        print >>sys.stderr, '{0}: Slower than target: {1}'.format(
+                sys.argv[0], ', '.join(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# vim: tw=79
+
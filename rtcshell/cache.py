@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: cache.py
+
+On-disk snapshot of the name server listings, shared between commands.
+
+The cache is disabled unless the RTCSH_CACHE_TTL environment variable is set
+to the number of seconds a listing stays valid. One file is kept for each name
+server. Each file holds the bindings of the naming contexts and managers that
+have been listed, keyed by their full path, along with the time each listing
+was made. It also holds the stringified object references of components that
+have been used directly, keyed by their full path. These expire like the
+listings; callers must also fall back to the name server when a reference
+no longer works.
+Finally, it holds the names used by shell completion, which are always cached
+but only for a few seconds. The files are read from disk the first time a name
+server is used. When the process exits, the changes it made are applied to
+the files as they are then on disk, so changes made by other commands in the
+meantime, such as invalidated listings, are kept.
+
+'''
+
+# $Source$
+
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+TTL_ENV_VAR = 'RTCSH_CACHE_TTL'
+DIR_ENV_VAR = 'RTCSH_CACHE_DIR'
+
+
+_lock = threading.RLock()
+# Listings and object references loaded from disk, by name server
+_servers = {}
+# Changes made by this process that need to be written back to disk, by name
+# server
+_changes = {}
+
+
+def get_ttl():
+    '''Get the number of seconds a cached listing is valid for.
+
+    Returns 0 if the cache is disabled.
+
+    '''
+    try:
+        return max(float(os.environ.get(TTL_ENV_VAR, 0)), 0)
+    except ValueError:
+        return 0
+
+
+def enabled():
+    return get_ttl() > 0
+
+
+def cache_dir():
+    if DIR_ENV_VAR in os.environ:
+        return os.environ[DIR_ENV_VAR]
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'rtcshell')
+
+
+def server_of(full_path):
+    '''Get the name server part of a full path.'''
+    return full_path.lstrip('/').split('/')[0]
+
+
+def server_file(server):
+    # Characters such as ':' cannot be used in file names on all platforms
+    name = ''.join([c if c.isalnum() or c in '.-_' else '%{0:02X}'.format(
+                    ord(c)) for c in server])
+    return os.path.join(cache_dir(), name + '.json')
+
+
+def empty_server():
+    return {'listings': {}, 'iors': {}, 'names': {}}
+
+
+def read_server(server):
+    '''Read the cached data for a name server from disk.'''
+    data = empty_server()
+    try:
+        f = open(server_file(server), 'r')
+        try:
+            loaded = json.load(f)
+        finally:
+            f.close()
+        if isinstance(loaded, dict):
+            for key in data:
+                data[key].update(loaded.get(key, {}))
+    except (IOError, ValueError):
+        pass
+    return data
+
+
+def load_server(server):
+    '''Get the cached data for a name server, reading it from disk if needed.
+
+    The result is a dictionary holding the listings, the object references and
+    the completion names, each keyed by full path.
+
+    '''
+    with _lock:
+        if server not in _servers:
+            _servers[server] = read_server(server)
+        return _servers[server]
+
+
+def apply_change(data, change):
+    '''Apply a change recorded by change() to a name server's data.'''
+    if change[0] == 'set':
+        section, full_path, value = change[1:]
+        data[section][full_path] = value
+    elif change[0] == 'names':
+        full_path, kind, value = change[1:]
+        data['names'].setdefault(full_path, {})[kind] = value
+    elif change[0] == 'invalidate':
+        full_path = change[1]
+        prefix = full_path.rstrip('/') + '/'
+        for cached in data.values():
+            for p in cached.keys():
+                if p == full_path or p.startswith(prefix):
+                    del cached[p]
+    elif change[0] == 'clear':
+        data.clear()
+        data.update(empty_server())
+
+
+def change(server, *args):
+    '''Make a change to a name server's data and record it for flush().'''
+    with _lock:
+        apply_change(load_server(server), args)
+        if args[0] == 'clear':
+            # Nothing recorded before this matters any more
+            _changes[server] = []
+        _changes.setdefault(server, []).append(args)
+
+
+def get_listing(full_path, ttl=None):
+    '''Get the cached listing of a naming context or manager.
+
+    A listing is a list of (name, is_context, ior) tuples; ior is None for
+    objects that must be resolved through the naming context. Returns None if
+    the cache is disabled, or if there is no listing younger than ttl seconds
+    (the configured TTL by default).
+
+    '''
+    if ttl is None:
+        ttl = get_ttl()
+    if ttl <= 0:
+        return None
+    with _lock:
+        entry = load_server(server_of(full_path))['listings'].get(full_path)
+        if not entry or time.time() - entry['time'] > ttl:
+            return None
+        return [(str(n), c, i and str(i)) for n, c, i in entry['bindings']]
+
+
+def store_listing(full_path, bindings):
+    '''Store the listing of a naming context or manager, if enabled.'''
+    if not enabled():
+        return
+    change(server_of(full_path), 'set', 'listings', full_path,
+           {'time': time.time(), 'bindings': list(bindings)})
+
+
+def get_ior(full_path):
+    '''Get the cached object reference of a path as a string.
+
+    Returns None if the cache is disabled or the path's reference is not
+    cached or older than the configured TTL.
+
+    '''
+    if not enabled():
+        return None
+    with _lock:
+        entry = load_server(server_of(full_path))['iors'].get(full_path)
+        if not isinstance(entry, dict) or \
+                time.time() - entry['time'] > get_ttl():
+            return None
+        return str(entry['ior'])
+
+
+def store_ior(full_path, ior):
+    '''Store the stringified object reference of a path, if enabled.'''
+    if not enabled():
+        return
+    server = server_of(full_path)
+    with _lock:
+        if get_ior(full_path) != ior:
+            change(server, 'set', 'iors', full_path,
+                   {'time': time.time(), 'ior': ior})
+
+
+def get_names(kind, full_path, ttl):
+    '''Get a cached list of names used for completion.
+
+    kind is the kind of names (e.g. objects or ports) for the object at
+    full_path. Names are cached whether or not the listing cache is enabled,
+    as they are only kept for a short ttl. Returns None if there are no names
+    younger than ttl seconds.
+
+    '''
+    if ttl <= 0:
+        return None
+    with _lock:
+        names = load_server(server_of(full_path))['names']
+        entry = names.get(full_path, {}).get(kind)
+        if not entry or time.time() - entry['time'] > ttl:
+            return None
+        return [str(n) for n in entry['names']]
+
+
+def store_names(kind, full_path, names):
+    '''Store a list of names used for completion.'''
+    change(server_of(full_path), 'names', full_path, kind,
+           {'time': time.time(), 'names': list(names)})
+
+
+def invalidate(full_path):
+    '''Remove everything cached for a path and the paths below it.
+
+    Does nothing if the cache is disabled.
+
+    '''
+    if not enabled():
+        return
+    change(server_of(full_path), 'invalidate', full_path)
+
+
+def invalidate_server(server):
+    '''Remove everything cached for a name server.
+
+    Does nothing if the cache is disabled.
+
+    '''
+    if not enabled():
+        return
+    change(server, 'clear')
+
+
+def flush():
+    '''Write the changes made to the name servers' data to disk.
+
+    The changes are applied to each file as it is now, so that changes made
+    by other commands since it was read are not lost. Each file is written
+    to a temporary file and renamed into place, so commands running at the
+    same time never see a partial file.
+
+    '''
+    with _lock:
+        if not _changes:
+            return
+        dir = cache_dir()
+        try:
+            if not os.path.exists(dir):
+                os.makedirs(dir, 0700)
+            for server, changes in _changes.items():
+                data = read_server(server)
+                for c in changes:
+                    apply_change(data, c)
+                fd, tmp = tempfile.mkstemp(dir=dir)
+                f = os.fdopen(fd, 'w')
+                try:
+                    json.dump(data, f)
+                finally:
+                    f.close()
+                os.rename(tmp, server_file(server))
+                _servers[server] = data
+        except (IOError, OSError):
+            # The cache is only an optimisation; failing to write it is not
+            # an error
+            pass
+        _changes.clear()
+
+
+atexit.register(flush)
+
+
+# vim: tw=79
+
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: complete.py
+
+Back end for shell completion.
+
+Prints the names of objects, ports or configuration parameters, one per line
+with no colour. The names are cached on disk for a few seconds, so pressing
+tab repeatedly in the same place does not contact the name servers again.
+The CORBA modules are only imported when the cache cannot answer.
+
+'''
+
+# $Source$
+
+
+import os
+from rtctree.path import parse_path
+import sys
+
+from rtcshell import cache
+from rtcshell.path import cmd_path_to_full_path
+
+
+TTL_ENV_VAR = 'RTCSH_COMPLETION_TTL'
+DEFAULT_TTL = 10
+KINDS = ['objects', 'ports', 'params']
+
+
+def get_ttl():
+    try:
+        return float(os.environ.get(TTL_ENV_VAR, DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def object_names(path):
+    '''Get the names in a directory. Directories have a trailing slash.'''
+    from rtcshell import naming
+    if len(path) < 2:
+        # The root directory holds the known name servers
+        return [e.name + '/' for e in naming.get_root_entries(path)]
+    entry = naming.get_entry(path)
+    if not entry:
+        return []
+    result = []
+    for child in entry.children:
+        if child.is_directory:
+            result.append(child.name + '/')
+        else:
+            result.append(child.name)
+    return result
+
+
+def port_names(path):
+    from rtcshell.direct import get_node
+    tree, node = get_node(path, detached=True)
+    if not node or not node.is_component:
+        return []
+    return [p.name for p in node.ports]
+
+
+def param_names(path):
+    '''Get the names of the parameters in all the component's sets.'''
+    from rtcshell.direct import get_node
+    tree, node = get_node(path, detached=True)
+    if not node or not node.is_component:
+        return []
+    result = set()
+    for conf_set in node.conf_sets.values():
+        result.update(conf_set.data.keys())
+    return sorted(result)
+
+
+def get_names(kind, cmd_path):
+    '''Get the names of a kind for a path, using the cache if possible.'''
+    path, port = parse_path(cmd_path_to_full_path(cmd_path))
+    if not path[-1]:
+        path = path[:-1]
+    if len(path) < 2:
+        # The name servers are known without contacting anything
+        if kind == 'objects':
+            return object_names(path)
+        return []
+    full_path = '/' + '/'.join(path[1:])
+    ttl = get_ttl()
+    names = cache.get_names(kind, full_path, ttl)
+    if names is None:
+        if kind == 'objects':
+            names = object_names(path)
+        elif kind == 'ports':
+            names = port_names(path)
+        else:
+            names = param_names(path)
+        if ttl > 0:
+            cache.store_names(kind, full_path, names)
+    return names
+
+
+def main(argv=None):
+    usage = '''Usage: rtsh complete <kind> [path]
+Print names for shell completion.
+
+The kind is one of:
+    objects     The contents of the directory at path.
+    ports       The ports of the component at path.
+    params      The parameters in the configuration sets of the component at
+                path.
+
+Names are printed one per line, with a trailing slash on directories. Results
+are cached for the number of seconds in the {0} environment
+variable ({1} by default).'''.format(TTL_ENV_VAR, DEFAULT_TTL)
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv or argv[0] not in KINDS or len(argv) > 2 or \
+            (argv[0] != 'objects' and len(argv) != 2):
+        print >>sys.stderr, usage
+        return 1
+    if len(argv) == 1:
+        cmd_path = ''
+    else:
+        cmd_path = argv[1]
+    for n in get_names(argv[0], cmd_path):
+        print n
+    return 0
+
+
+# vim: tw=79
+
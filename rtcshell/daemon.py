@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: daemon.py
+
+Background process that keeps an ORB and RTC tree ready for the commands.
+
+The command scripts forward their arguments to the daemon over a local socket
+when it is running, and run the command themselves when it is not. Only
+light-weight modules are imported at the top of this file so that forwarding
+a command is fast.
+
+'''
+
+# $Source$
+
+
+import json
+from optparse import OptionParser, OptionError
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+from rtcshell import RTSH_VERSION
+from rtcshell.path import ENV_VAR
+
+
+SOCKET_ENV_VAR = 'RTCSH_DAEMON_SOCKET'
+NO_DAEMON_ENV_VAR = 'RTCSH_NO_DAEMON'
+# Environment variables passed from the client to the command in the daemon
+FORWARDED_ENV_VARS = [ENV_VAR, 'RTCTREE_NAMESERVERS', 'RTCSH_CACHE_TTL',
+                      'RTCSH_TIMEOUT', 'COLUMNS', 'LINES', 'ROWS']
+
+
+def socket_path():
+    '''Get the path of the daemon's socket for the current user.'''
+    if SOCKET_ENV_VAR in os.environ:
+        return os.environ[SOCKET_ENV_VAR]
+    return os.path.join(tempfile.gettempdir(),
+                        'rtcshell-{0}'.format(os.getuid()), 'daemon.sock')
+
+
+def check_private(path, is_dir):
+    '''Check that a path can only be used by the current user.
+
+    The path must not be a symbolic link, must be owned by the current user,
+    and must not be accessible by any other user. Returns None if it passes,
+    or a message saying why it does not.
+
+    '''
+    try:
+        st = os.lstat(path)
+    except OSError, e:
+        return '{0}: {1}'.format(path, e.strerror)
+    if is_dir and not stat.S_ISDIR(st.st_mode):
+        return '{0}: Not a directory'.format(path)
+    if not is_dir and not stat.S_ISSOCK(st.st_mode):
+        return '{0}: Not a socket'.format(path)
+    if st.st_uid != os.getuid():
+        return '{0}: Owned by another user'.format(path)
+    if st.st_mode & 0077:
+        return '{0}: Accessible by other users'.format(path)
+    return None
+
+
+def encode(data):
+    # JSON can only carry unicode strings, so pass bytes through latin-1.
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return data.decode('latin-1')
+
+
+def send_message(sock, **kwargs):
+    sock.sendall(json.dumps(kwargs) + '\n')
+
+
+def connect():
+    '''Connect to the daemon. Returns None if it is not running.'''
+    if not hasattr(socket, 'AF_UNIX') or NO_DAEMON_ENV_VAR in os.environ:
+        return None
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    error = check_private(os.path.dirname(path), True) or \
+            check_private(path, False)
+    if error:
+        # Someone else could be listening; do not send them anything
+        print >>sys.stderr, '{0}: Not using the daemon: {1}'.format(\
+                sys.argv[0], error)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+    return sock
+
+
+def reads_stdin(argv):
+    '''Check if a command's arguments make it read its standard input.'''
+    return [a for a in argv if a == '-' or a.endswith('=-')] != []
+
+
+def terminal_env():
+    '''Get environment variables giving the size of this process's terminal.
+
+    The daemon has no terminal, so rtctree lays out the output of a command
+    using these instead. Returns an empty dictionary if there is no terminal.
+
+    '''
+    try:
+        import fcntl
+        import struct
+        import termios
+    except ImportError:
+        return {}
+    for fd in [1, 0, 2]:
+        try:
+            rows, cols = struct.unpack('hh', fcntl.ioctl(fd,
+                    termios.TIOCGWINSZ, '0000'))
+        except IOError:
+            continue
+        if rows and cols:
+            return {'COLUMNS': str(cols), 'LINES': str(rows),
+                    'ROWS': str(rows)}
+    return {}
+
+
+def forward(command, argv):
+    '''Run a command in the daemon, if it is running.
+
+    The command's output is written to this process's stdout and stderr as
+    the daemon produces it. The command is run in this process's working
+    directory, so relative file names are found. Commands that read their
+    standard input are not forwarded, as the daemon cannot read it.
+
+    Returns the command's result, or None if the daemon is not running and
+    the command should be run directly.
+
+    '''
+    if reads_stdin(argv):
+        return None
+    sock = connect()
+    if not sock:
+        return None
+    env = dict([(k, os.environ.get(k)) for k in FORWARDED_ENV_VARS])
+    env.update(terminal_env())
+    try:
+        send_message(sock, command=command, argv=argv, env=env,
+                     cwd=encode(os.getcwd()), tty=sys.stdout.isatty())
+        for line in sock.makefile('r'):
+            message = json.loads(line)
+            if 'stdout' in message:
+                sys.stdout.write(message['stdout'].encode('latin-1'))
+                sys.stdout.flush()
+            elif 'stderr' in message:
+                sys.stderr.write(message['stderr'].encode('latin-1'))
+            elif 'result' in message:
+                return message['result']
+    except socket.error, e:
+        pass
+    finally:
+        sock.close()
+    # The command may have been partly carried out, so it must not be run
+    # again directly.
+    print >>sys.stderr, '{0}: Lost connection to rtcshell daemon.'.format(\
+            command)
+    return 1
+
+
+class SocketWriter(object):
+    '''File-like object that sends everything written to it to a client.'''
+    def __init__(self, sock, stream, tty=False):
+        self._sock = sock
+        self._stream = stream
+        self._tty = tty
+
+    def write(self, data):
+        if data:
+            send_message(self._sock, **{self._stream: encode(data)})
+
+    def writelines(self, lines):
+        for l in lines:
+            self.write(l)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return self._tty
+
+
+def handle_client(sock, session):
+    '''Run the command requested by a client and send it the results.
+
+    Returns False if the daemon should stop.
+
+    '''
+    try:
+        request = json.loads(sock.makefile('r').readline())
+        if request.get('command') == 'shutdown':
+            send_message(sock, result=0)
+            return False
+        elif request.get('command') == 'status':
+            send_message(sock, stdout=encode('rtcshell daemon running, \
+pid {0}\n'.format(os.getpid())))
+            send_message(sock, result=0)
+            return True
+        command = str(request['command'])
+        argv = [a.encode('utf-8') for a in request['argv']]
+        env = {}
+        for k, v in request['env'].items():
+            if v is None:
+                env[str(k)] = None
+            else:
+                env[str(k)] = v.encode('utf-8')
+        tty = request.get('tty', False)
+        cwd = request.get('cwd')
+        if cwd is not None:
+            cwd = cwd.encode('latin-1')
+        result = session.run(command, argv,
+                             stdout=SocketWriter(sock, 'stdout', tty),
+                             stderr=SocketWriter(sock, 'stderr'), env=env,
+                             cwd=cwd)
+        send_message(sock, result=result)
+    except (socket.error, ValueError, KeyError):
+        # Lost or bad client; nothing useful can be reported to it
+        pass
+    finally:
+        sock.close()
+    return True
+
+
+def make_socket_dir(path):
+    '''Create the directory holding the socket, if necessary.
+
+    Returns None if the directory is private to the current user, or a
+    message saying why it cannot be used.
+
+    '''
+    dir = os.path.dirname(path)
+    if not os.path.lexists(dir):
+        try:
+            os.makedirs(dir, 0700)
+        except OSError, e:
+            return '{0}: {1}'.format(dir, e.strerror)
+    return check_private(dir, True)
+
+
+def serve(path):
+    error = make_socket_dir(path)
+    if error:
+        print >>sys.stderr, '{0}: Cannot use the socket directory: \
+{1}'.format(sys.argv[0], error)
+        return 1
+    # Imported here to keep forwarding light-weight
+    from rtcshell.session import Session
+    session = Session()
+
+    if os.path.lexists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    os.chmod(path, 0600)
+    server.listen(5)
+    try:
+        while True:
+            sock, addr = server.accept()
+            if not handle_client(sock, session):
+                break
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+    return 0
+
+
+def send_control(command):
+    sock = connect()
+    if not sock:
+        print >>sys.stderr, '{0}: Daemon is not running.'.format(sys.argv[0])
+        return 1
+    try:
+        send_message(sock, command=command)
+        for line in sock.makefile('r'):
+            message = json.loads(line)
+            if 'stdout' in message:
+                sys.stdout.write(message['stdout'].encode('latin-1'))
+            elif 'result' in message:
+                return message['result']
+    finally:
+        sock.close()
+    return 1
+
+
+def main(argv=None):
+    usage = '''Usage: %prog [options]
+Run the rtcshell daemon.
+
+The daemon keeps an ORB and an RTC tree ready in the background. While it is
+running, the rtcshell commands pass their arguments to it rather than starting
+up their own ORB and building their own tree. If the daemon is not running, the
+commands run as normal.
+
+The daemon listens on a socket in a directory only accessible by the current
+user. Set the {0} environment variable to use a different socket. Set
+the {1} environment variable to stop the commands from using the
+daemon. The tree is rebuilt after commands that change objects, and when it is
+older than the number of seconds in the RTCSH_TREE_MAX_AGE environment
+variable. The components shown by rtcat, rtconf and rtls -l are reparsed
+before the command runs. Commands are run in the working directory and with
+the terminal size of the command that sent them. Commands given '-' to read
+their standard input are always run directly.'''.format(SOCKET_ENV_VAR, NO_DAEMON_ENV_VAR)
+    version = RTSH_VERSION
+    parser = OptionParser(usage=usage, version=version)
+    parser.add_option('-b', '--background', dest='background',
+            action='store_true', default=False,
+            help='Run the daemon in the background. [Default: %default]')
+    parser.add_option('--status', dest='status', action='store_true',
+            default=False, help='Check if the daemon is running.')
+    parser.add_option('--stop', dest='stop', action='store_true',
+            default=False, help='Stop the daemon.')
+    parser.add_option('-d', '--debug', dest='debug', action='store_true',
+            default=False, help='Print debugging information. \
+[Default: %default]')
+
+    if argv:
+        sys.argv = [sys.argv[0]] + argv
+    try:
+        options, args = parser.parse_args()
+    except OptionError, e:
+        print 'OptionError:', e
+        return 1
+
+    if not hasattr(socket, 'AF_UNIX'):
+        print >>sys.stderr, '{0}: The daemon is not supported on this \
+platform.'.format(sys.argv[0])
+        return 1
+    if options.stop:
+        return send_control('shutdown')
+    if options.status:
+        return send_control('status')
+    if connect():
+        print >>sys.stderr, '{0}: Daemon is already running.'.format(\
+                sys.argv[0])
+        return 1
+
+    error = make_socket_dir(socket_path())
+    if error:
+        # Checked before going into the background, so the user sees it
+        print >>sys.stderr, '{0}: Cannot use the socket directory: \
+{1}'.format(sys.argv[0], error)
+        return 1
+    if options.background:
+        if os.fork():
+            return 0
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in range(3):
+            os.dup2(devnull, fd)
+    return serve(socket_path())
+
+
+# vim: tw=79
+
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: deadline.py
+
+A deadline for each call made to a remote object.
+
+By default the ORB waits as long as it takes for an object to answer, so an
+object on a host that has gone away can hold up a command until the network
+gives up. With a deadline, a call that takes too long fails instead, and the
+object can be treated as unreachable. The deadline is taken from the
+RTCSH_TIMEOUT environment variable, or set by a command's --timeout option.
+
+'''
+
+# $Source$
+
+
+import os
+
+
+ENV_VAR = 'RTCSH_TIMEOUT'
+
+# The deadline set by the running command, overriding the environment
+_timeout = None
+# The deadline, in milliseconds, last given to the ORB
+_applied = 0
+
+
+def get_timeout():
+    '''Get the deadline in seconds. Zero means there is no deadline.'''
+    if _timeout is not None:
+        return _timeout
+    try:
+        return max(float(os.environ.get(ENV_VAR, 0)), 0)
+    except ValueError:
+        return 0
+
+
+def set_timeout(seconds):
+    '''Set the deadline for this process.
+
+    Passing None returns to the deadline given in the environment.
+
+    '''
+    global _timeout
+    _timeout = seconds
+    if int(get_timeout() * 1000) != _applied:
+        apply_timeout()
+
+
+def apply_timeout():
+    '''Give the deadline to the ORB.
+
+    This should be called again once the ORB has been created, as creating
+    it may reset the ORB's settings. If there is no deadline and none has
+    been given to the ORB, the CORBA modules are not imported.
+
+    '''
+    global _applied
+    ms = int(get_timeout() * 1000)
+    if not ms and not _applied:
+        return
+    import omniORB
+    omniORB.setClientCallTimeout(ms)
+    if hasattr(omniORB, 'setClientConnectTimeout'):
+        omniORB.setClientConnectTimeout(ms)
+    _applied = ms
+
+
+def unreachable_errors():
+    '''Get the exceptions raised by calls to objects that cannot be reached.
+
+    A call that misses the deadline raises one of these.
+
+    '''
+    from omniORB import CORBA
+    return (CORBA.TRANSIENT, CORBA.OBJECT_NOT_EXIST, CORBA.COMM_FAILURE,
+            CORBA.TIMEOUT)
+
+
+# vim: tw=79
+
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: direct.py
+
+Direct access to single components through cached object references.
+
+Commands that work on a single component do not need an RTC tree if the
+component's object reference is already known. When the cache is enabled, the
+references of components found in a tree are stored, and later commands use
+them to reach the component with no naming calls at all. If a stored
+reference no longer works, it is forgotten and the command falls back to
+building a tree. Stored references expire with the cache's TTL.
+
+A component reached this way is not part of a tree, so it has no parent and
+its ports' connections cannot be followed to other components. It is only
+used by commands that change the component's state or configuration.
+
+'''
+
+# $Source$
+
+
+from rtcshell import cache
+from rtcshell.lazy import create_rtctree
+
+
+def path_key(path):
+    '''Make the cache key for a path list.'''
+    return '/' + '/'.join(path[1:])
+
+
+def get_cached_component(path, orb=None):
+    '''Get a component using its cached object reference.
+
+    Returns a component node that is not part of any tree, or None if the
+    reference is not cached or no longer refers to a working component.
+
+    '''
+    ior = cache.get_ior(path_key(path))
+    if not ior:
+        return None
+    from omniORB import CORBA
+    from rtctree.component import Component
+    import RTC
+    from rtcshell import naming
+    try:
+        object = naming.get_orb(orb).string_to_object(ior)._narrow(
+                RTC.RTObject)
+        if CORBA.is_nil(object):
+            cache.invalidate(path_key(path))
+            return None
+        # Creating the node fetches the component's profile, which checks the
+        # reference still works.
+        return Component(path[-1], None, object)
+    except CORBA.Exception:
+        cache.invalidate(path_key(path))
+        return None
+
+
+def get_node(path, tree=None, detached=False):
+    '''Get the node for a path, using a cached reference if possible.
+
+    If no tree is given, detached is True and the path's reference is cached,
+    the component is returned without creating a tree. Only pass detached if
+    the node's parent and the other nodes of the tree are not needed.
+    Otherwise the node is found in the tree, creating the tree if necessary,
+    and the references of components are stored for next time. Returns a
+    (tree, node) tuple; the tree is None if the cached reference was used or
+    the tree could not be created, and the node is None if there is no object
+    at the path.
+
+    '''
+    if not tree:
+        if detached:
+            node = get_cached_component(path)
+            if node:
+                return None, node
+        tree = create_rtctree(paths=path)
+        if not tree:
+            return None, None
+    if not tree.has_path(path):
+        return tree, None
+    node = tree.get_node(path)
+    if node.is_component and cache.enabled():
+        from rtcshell import naming
+        cache.store_ior(path_key(path),
+                        naming.get_orb().object_to_string(node.object))
+    return tree, node
+
+
+# vim: tw=79
+
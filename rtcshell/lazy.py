@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: lazy.py
+
+Wrappers that delay importing the heavy CORBA modules until they are used.
+
+Importing rtctree.tree loads the ORB and every RT-Middleware stub module,
+which takes longer than anything else a command does before it contacts a
+name server. The commands use these wrappers so that printing help, reporting
+usage errors and other work that never touches a name server does not pay
+for those imports.
+
+'''
+
+# $Source$
+
+
+from rtcshell import deadline
+
+
+def create_rtctree(*args, **kwargs):
+    '''Create an RTC tree. See rtctree.tree.create_rtctree.
+
+    If there is a deadline for calls to objects, the ORB is created first so
+    the deadline is in place before the tree contacts anything.
+
+    '''
+    from rtctree.tree import create_rtctree
+    if deadline.get_timeout() or kwargs.get('orb'):
+        from rtcshell import naming
+        kwargs['orb'] = naming.get_orb(kwargs.get('orb'))
+    return create_rtctree(*args, **kwargs)
+
+
+def server_paths(paths):
+    '''Get one path for each name server named in a list of paths.
+
+    A tree created from a list of paths adds the name server of every path,
+    parsing the whole server again each time, so a tree for many paths
+    should be created from these instead.
+
+    '''
+    servers = []
+    for path in paths:
+        if len(path) > 1 and path[1] and path[1] not in servers:
+            servers.append(path[1])
+    return [['/', s] for s in servers]
+
+
+# vim: tw=79
+
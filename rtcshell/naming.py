@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: naming.py
+
+Functions for walking name servers directly.
+
+Building an RTC tree parses every naming context on the name servers it
+contacts. The functions in this module instead list one naming context at a
+time, so a caller can stop descending as soon as it has what it needs.
+
+'''
+
+# $Source$
+
+
+from omniORB import CORBA
+import CosNaming
+import os
+import RTM
+import sys
+
+from rtcshell import cache
+from rtcshell import deadline
+from rtcshell.parallel import parallel_map
+
+
+LIST_BATCH_SIZE = 100
+NAMESERVERS_ENV_VAR = 'RTCTREE_NAMESERVERS'
+ORB_ARGS_ENV_VAR = 'RTCTREE_ORB_ARGS'
+
+
+def get_orb(orb=None):
+    '''Get an ORB, creating it using the rtctree ORB arguments if necessary.
+
+    The deadline for calls to objects is given to the ORB.
+
+    '''
+    if not orb:
+        args = [sys.argv[0]]
+        if ORB_ARGS_ENV_VAR in os.environ:
+            args += [a for a in os.environ[ORB_ARGS_ENV_VAR].split(';') if a]
+        orb = CORBA.ORB_init(args, CORBA.ORB_ID)
+    deadline.apply_timeout()
+    return orb
+
+
+def env_name_servers():
+    '''Get the list of name servers given in the environment.'''
+    if NAMESERVERS_ENV_VAR not in os.environ:
+        return []
+    return [s for s in os.environ[NAMESERVERS_ENV_VAR].split(';') if s]
+
+
+def split_name(name):
+    '''Split a path element into the id and kind of a naming binding.'''
+    id, dot, kind = name.rpartition('.')
+    if not dot:
+        return name, ''
+    return id, kind
+
+
+def join_name(binding_name):
+    '''Make a path element from a CosNaming name with a single component.'''
+    if binding_name[0].kind:
+        return binding_name[0].id + '.' + binding_name[0].kind
+    return binding_name[0].id
+
+
+class NamingEntry(object):
+    '''A single object found while walking the name servers.
+
+    The type properties match those of the nodes of an RTC tree, but are
+    determined from the naming binding alone. The object reference is only
+    resolved and narrowed when the object or children properties are used.
+
+    '''
+    def __init__(self, name, full_path, path, orb, parent=None,
+                 is_context=False, object=None):
+        self.name = name
+        self.full_path = full_path
+        self.path = path
+        self.orb = orb
+        self.parent = parent
+        self._is_context = is_context
+        self._object = object
+        self._narrowed = None
+
+    @property
+    def kind(self):
+        return split_name(self.name)[1]
+
+    @property
+    def is_nameserver(self):
+        return len(self.path) == 2
+
+    @property
+    def is_directory(self):
+        return self._is_context
+
+    @property
+    def is_component(self):
+        return not self._is_context and self.kind == 'rtc'
+
+    @property
+    def is_manager(self):
+        return not self._is_context and self.kind == 'mgr'
+
+    @property
+    def is_unknown(self):
+        return not self._is_context and self.kind not in ['rtc', 'mgr']
+
+    @property
+    def object(self):
+        '''The narrowed object reference for this entry.'''
+        if self._narrowed is None:
+            if self._object is None:
+                id, kind = split_name(self.name)
+                self._object = self.parent.object.resolve(
+                        [CosNaming.NameComponent(id, kind)])
+            if self._is_context:
+                self._narrowed = self._object._narrow(CosNaming.NamingContext)
+            elif self.is_manager:
+                self._narrowed = self._object._narrow(RTM.Manager)
+            else:
+                self._narrowed = self._object
+        return self._narrowed
+
+    @property
+    def children(self):
+        '''List the entries directly below this entry.
+
+        Naming contexts are listed; managers are asked for their components.
+        Other objects have no children.
+
+        '''
+        if self._is_context:
+            return list_context(self)
+        elif self.is_manager:
+            return list_manager(self)
+        return []
+
+
+def child_path(full_path, name):
+    if full_path.endswith('/'):
+        return full_path + name
+    return full_path + '/' + name
+
+
+def make_child(parent, name, is_context, ior=None):
+    object = None
+    if ior:
+        object = parent.orb.string_to_object(ior)
+    return NamingEntry(name, child_path(parent.full_path, name),
+                       parent.path + [name], parent.orb, parent=parent,
+                       is_context=is_context, object=object)
+
+
+def list_context(entry):
+    '''Get the entries in a naming context with a single list() call.
+
+    The bindings are fetched in batches using the binding iterator, if the
+    name server returns one. If the snapshot cache is enabled and holds the
+    context, it is used instead.
+
+    '''
+    listing = cache.get_listing(entry.full_path)
+    if listing is None:
+        listing = []
+        bindings, iterator = entry.object.list(LIST_BATCH_SIZE)
+        while True:
+            for b in bindings:
+                listing.append((join_name(b.binding_name),
+                                b.binding_type == CosNaming.ncontext, None))
+            if CORBA.is_nil(iterator):
+                break
+            more, bindings = iterator.next_n(LIST_BATCH_SIZE)
+            if not more:
+                iterator.destroy()
+                break
+        cache.store_listing(entry.full_path, listing)
+    return [make_child(entry, n, c, i) for n, c, i in listing]
+
+
+def list_manager(entry):
+    '''Get entries for the components held by a manager.
+
+    If the snapshot cache is enabled and holds the manager, it is used
+    instead.
+
+    '''
+    listing = cache.get_listing(entry.full_path)
+    if listing is None:
+        listing = []
+        for comp in entry.object.get_components():
+            name = comp.get_component_profile().instance_name + '.rtc'
+            listing.append((name, False, entry.orb.object_to_string(comp)))
+        cache.store_listing(entry.full_path, listing)
+    return [make_child(entry, n, c, i) for n, c, i in listing]
+
+
+def get_name_server_entry(address, orb):
+    '''Get the entry for the root naming context of a name server.'''
+    object = orb.string_to_object('corbaloc::{0}/NameService'.format(address))
+    return NamingEntry(address, '/' + address, ['/', address], orb,
+                       is_context=True, object=object)
+
+
+def get_entry(path, orb=None):
+    '''Find the entry for a path.
+
+    The path is a list as returned by rtctree.path.parse_path. Returns None if
+    there is no object at the path. The root path, ['/'], has no entry; use
+    get_root_entries() for the name servers below it.
+
+    If the snapshot cache is enabled, the path is found using the cached
+    listings of the contexts along it. Otherwise, each element of the path is
+    resolved in turn without listing any naming contexts.
+
+    '''
+    if len(path) < 2:
+        return None
+    orb = get_orb(orb)
+    use_cache = cache.enabled()
+    try:
+        entry = get_name_server_entry(path[1], orb)
+        if not use_cache and CORBA.is_nil(entry.object):
+            return None
+        for name in path[2:]:
+            if use_cache or entry.is_manager:
+                matches = [e for e in entry.children if e.name == name]
+                if not matches:
+                    return None
+                entry = matches[0]
+                continue
+            elif not entry.is_directory:
+                return None
+            id, kind = split_name(name)
+            object = entry.object.resolve([CosNaming.NameComponent(id, kind)])
+            context = object._narrow(CosNaming.NamingContext)
+            entry = NamingEntry(name, child_path(entry.full_path, name),
+                                entry.path + [name], orb, parent=entry,
+                                is_context=not CORBA.is_nil(context),
+                                object=object)
+    except CosNaming.NamingContext.NotFound:
+        return None
+    except (CORBA.TRANSIENT, CORBA.OBJECT_NOT_EXIST, CORBA.COMM_FAILURE):
+        print >>sys.stderr, '{0}: Cannot access {1}: Name server not \
+available.'.format(sys.argv[0], path[1])
+        return None
+    return entry
+
+
+def get_root_entries(path=None, orb=None):
+    '''Get the name server entries that make up the root directory.
+
+    These are the name servers listed in the environment, plus the name
+    server in path, if any.
+
+    '''
+    orb = get_orb(orb)
+    servers = env_name_servers()
+    if path and len(path) > 1 and path[1] and path[1] not in servers:
+        servers.append(path[1])
+    return [get_name_server_entry(s, orb) for s in servers]
+
+
+def can_descend(entry, descend_managers=True):
+    '''Check if walk() lists the children of an entry.'''
+    if entry.is_manager:
+        return descend_managers
+    return entry.is_directory
+
+
+def get_children(entry):
+    '''Get the children of an entry, or an empty list if it cannot be reached.
+
+    A message is printed if the entry cannot be reached.
+
+    '''
+    try:
+        return entry.children
+    except deadline.unreachable_errors() + (CosNaming.NamingContext.NotFound,):
+        # Any cached information about this entry is out of date
+        cache.invalidate(entry.full_path)
+        print >>sys.stderr, '{0}: Cannot access {1}: Object not \
+available.'.format(sys.argv[0], entry.full_path)
+        return []
+
+
+class RootEntry(NamingEntry):
+    '''The root directory, holding the known name servers.'''
+    def __init__(self, path=None, orb=None):
+        orb = get_orb(orb)
+        super(RootEntry, self).__init__('/', '/', ['/'], orb,
+                                        is_context=True)
+        self._servers = get_root_entries(path, orb)
+
+    @property
+    def children(self):
+        return list(self._servers)
+
+
+def walk(entry, max_depth=0, depth=0, descend_managers=True, jobs=1,
+         children=None):
+    '''Generator that walks the entries below entry, depth first.
+
+    Yields entry and every entry below it. If max_depth is greater than zero,
+    entries deeper than max_depth levels below entry are not yielded, and the
+    naming contexts at that depth are never listed. If descend_managers is
+    False, managers are not asked for their components, so no manager
+    objects are narrowed.
+
+    If jobs is greater than one, the children of the entries below each entry
+    are fetched concurrently, so that an object that is slow to answer does
+    not hold up its siblings. The entries are still yielded in the same
+    order. Entries that cannot be reached are skipped. If the children of
+    entry have already been fetched, they can be given in children.
+
+    '''
+    yield entry
+    if max_depth > 0 and depth >= max_depth:
+        return
+    if not can_descend(entry, descend_managers):
+        return
+    if children is None:
+        children = get_children(entry)
+    listings = [None] * len(children)
+    if jobs > 1 and (max_depth <= 0 or depth + 1 < max_depth):
+        parents = [ii for ii, c in enumerate(children) \
+                   if can_descend(c, descend_managers)]
+        fetched = parallel_map(get_children, [children[ii] for ii in parents],
+                               jobs)
+        for ii, listing in zip(parents, fetched):
+            listings[ii] = listing
+    for child, listing in zip(children, listings):
+        for result in walk(child, max_depth, depth + 1, descend_managers,
+                           jobs, listing):
+            yield result
+
+
+# vim: tw=79
+
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: parallel.py
+
+Functions for running remote calls concurrently.
+
+'''
+
+# $Source$
+
+
+import Queue
+import sys
+import threading
+
+
+DEFAULT_JOBS = 8
+
+
+def parallel_map(func, items, jobs=DEFAULT_JOBS):
+    '''Call func on each item in items using at most jobs worker threads.
+
+    The results are returned in the same order as items, regardless of the
+    order in which the calls complete. If any call raises an exception, the
+    first such exception (in item order) is re-raised once all the workers
+    have finished.
+
+    '''
+    items = list(items)
+    if jobs < 2 or len(items) < 2:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    work = Queue.Queue()
+    for ii, item in enumerate(items):
+        work.put((ii, item))
+
+    def worker():
+        while True:
+            try:
+                ii, item = work.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[ii] = func(item)
+            except Exception:
+                errors[ii] = sys.exc_info()
+
+    threads = [threading.Thread(target=worker) \
+               for ii in range(min(jobs, len(items)))]
+    for t in threads:
+        t.setDaemon(True)
+        t.start()
+    for t in threads:
+        t.join()
+
+    for e in errors:
+        if e:
+            raise e[0], e[1], e[2]
+    return results
+
+
+# vim: tw=79
+
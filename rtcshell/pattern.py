@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: pattern.py
+
+Functions for matching paths against shell-style glob patterns.
+
+'''
+
+# $Source$
+
+
+import re
+
+
+# Python's re module limits the number of groups in a single expression.
+MAX_PATTERNS_PER_RE = 99
+
+
+def glob_to_regex(pattern, ignore_case=False):
+    '''Convert a glob pattern into an unanchored regular expression string.
+
+    * matches any sequence of characters and ? matches any single character.
+    If ignore_case is True, each letter is converted to a character class
+    matching both cases. This allows case-sensitive and case-insensitive
+    patterns to be combined into a single expression.
+
+    '''
+    result = []
+    for c in pattern:
+        if c == '*':
+            result.append('.*?')
+        elif c == '?':
+            result.append('.')
+        elif ignore_case and c.lower() != c.upper():
+            result.append('[{0}{1}]'.format(re.escape(c.lower()),
+                                            re.escape(c.upper())))
+        else:
+            result.append(re.escape(c))
+    return ''.join(result)
+
+
+class GlobMatcher(object):
+    '''Matches strings against many glob patterns at once.
+
+    All the patterns are compiled into a single alternation, so a string is
+    checked against every pattern in one pass of the regular expression
+    engine rather than once per pattern.
+
+    '''
+    def __init__(self, patterns=[], ipatterns=[]):
+        '''Create a new matcher.
+
+        @param patterns Case-sensitive glob patterns.
+        @param ipatterns Case-insensitive glob patterns.
+
+        '''
+        self.patterns = [(p, False) for p in patterns] + \
+                        [(p, True) for p in ipatterns]
+        self._res = []
+        for start in range(0, len(self.patterns), MAX_PATTERNS_PER_RE):
+            chunk = self.patterns[start:start + MAX_PATTERNS_PER_RE]
+            alternation = '|'.join(['(' + glob_to_regex(p, i) + ')' \
+                                    for p, i in chunk])
+            self._res.append((start, re.compile(alternation)))
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def search(self, string):
+        '''Search string for any of the patterns.
+
+        Returns the index of a matching pattern, or None if no pattern
+        matches. Use the patterns attribute to get the pattern itself.
+
+        '''
+        for start, regex in self._res:
+            m = regex.search(string)
+            if m:
+                return start + m.lastindex - 1
+        return None
+
+
+def is_glob(cmd_path):
+    '''Check if a path contains any wildcards.'''
+    return '*' in cmd_path or '?' in cmd_path
+
+
+def expand_glob(tree, path, filter=[]):
+    '''Find the full paths of the nodes in the tree matching a path.
+
+    Each element of the path may contain * and ? wildcards, which are matched
+    against the names of the nodes at that level of the tree only. filter is
+    a list of node attribute names, such as 'is_component'; if given, only
+    matching nodes for which all of these are true are returned.
+
+    '''
+    nodes = [tree.get_node(['/'])]
+    for element in path[1:]:
+        if is_glob(element):
+            regex = re.compile('^(?:{0})$'.format(glob_to_regex(element)))
+            matches = lambda n: regex.match(n.name)
+        else:
+            matches = lambda n: n.name == element
+        nodes = [c for n in nodes for c in n.children if matches(c)]
+    return [n.full_path for n in nodes \
+            if not [f for f in filter if not getattr(n, f)]]
+
+
+# vim: tw=79
+
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: presets.py
+
+Named sets of data port connection properties.
+
+Built-in presets cover common uses. More can be defined in a configuration
+file, with one section per preset holding the connection properties, for
+example:
+
+[camera]
+dataport.subscription_type = new
+dataport.publisher.push_policy = skip
+dataport.publisher.skip_count = 2
+
+A preset in the file with the same name as a built-in preset replaces it.
+
+'''
+
+# $Source$
+
+
+import ConfigParser
+import os
+
+
+FILE_ENV_VAR = 'RTCSH_PRESETS'
+
+PRESETS = {
+    # Deliver every sample, buffering bursts rather than dropping them.
+    'high-throughput': {'dataport.dataflow_type': 'push',
+                        'dataport.subscription_type': 'new',
+                        'dataport.publisher.push_policy': 'all',
+                        'dataport.buffer.length': '128',
+                        'dataport.buffer.write.full_policy': 'block',
+                        'dataport.buffer.write.timeout': '1.0'},
+    # Send each sample as soon as it is written, in the writer's thread.
+    'low-latency': {'dataport.dataflow_type': 'push',
+                    'dataport.subscription_type': 'flush',
+                    'dataport.buffer.length': '1',
+                    'dataport.buffer.write.full_policy': 'overwrite'},
+    # Only the newest sample matters; older ones are dropped.
+    'lossy-latest': {'dataport.dataflow_type': 'push',
+                     'dataport.subscription_type': 'new',
+                     'dataport.publisher.push_policy': 'new',
+                     'dataport.buffer.length': '1',
+                     'dataport.buffer.write.full_policy': 'overwrite',
+                     'dataport.buffer.read.empty_policy': 'do_nothing'},
+    }
+
+# Properties that data ports advertise as a comma-separated list of the values
+# they support.
+ADVERTISED_PROPERTIES = ['dataport.dataflow_type', 'dataport.interface_type',
+                         'dataport.subscription_type']
+
+
+def preset_file():
+    '''Get the path of the file holding the user's presets.'''
+    if os.environ.get(FILE_ENV_VAR):
+        return os.environ[FILE_ENV_VAR]
+    base = os.environ.get('XDG_CONFIG_HOME') or \
+            os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'rtcshell', 'presets.conf')
+
+
+def load_presets(filename=None):
+    '''Get all the presets, including those in the user's preset file.
+
+    Raises ConfigParser.Error if the file cannot be parsed.
+
+    '''
+    result = dict(PRESETS)
+    parser = ConfigParser.RawConfigParser()
+    # Property names are case sensitive
+    parser.optionxform = str
+    parser.read([filename or preset_file()])
+    for section in parser.sections():
+        result[section] = dict(parser.items(section))
+    return result
+
+
+def get_preset(name, filename=None):
+    '''Get the properties of a preset.
+
+    Returns a (properties, error) tuple. The error is None if the preset was
+    found, or a message saying why it could not be.
+
+    '''
+    try:
+        presets = load_presets(filename)
+    except ConfigParser.Error, e:
+        return None, 'Bad preset file: {0}'.format(e)
+    if name not in presets:
+        return None, 'Unknown preset: {0} (known presets: {1})'.format(name,
+                ', '.join(sorted(presets.keys())))
+    return dict(presets[name]), None
+
+
+def check_port(props, port, cmd_path):
+    '''Check that a port supports the values of some connection properties.
+
+    Returns None if it does, or a message describing the first value the
+    port does not support. Properties the port does not advertise are not
+    checked.
+
+    '''
+    if port.porttype not in ['DataInPort', 'DataOutPort']:
+        return 'Cannot use a preset with {0}: Not a data port'.format(
+                cmd_path)
+    for key in ADVERTISED_PROPERTIES:
+        if key not in props or key not in port.properties:
+            continue
+        supported = [v.strip().lower() \
+                     for v in port.properties[key].split(',')]
+        if props[key].lower() not in supported and 'any' not in supported:
+            return '{0} does not support {1}={2} (supported: {3})'.format(
+                    cmd_path, key, props[key], port.properties[key])
+    return None
+
+
+# vim: tw=79
+
@@ -34,7 +34,8 @@ def activate_action(object, ec_index):
 
 
 def main(argv=None, tree=None):
-    return base_main('Activate a component.', activate_action, argv)
+    return base_main('Activate a component.', activate_action, argv, tree,
+                     'ACTIVE')
 
 
 # vim: tw=79
@@ -26,13 +26,13 @@ Implementation of the command to display component information.
 from optparse import OptionParser, OptionError
 import os
 from rtctree.exceptions import RtcTreeError
-from rtctree.tree import create_rtctree
 from rtctree.path import parse_path
 from rtctree.utils import build_attr_string, get_num_columns_and_rows, \
                             get_terminal_size
 import sys
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell.lazy import create_rtctree
 from rtcshell.path import cmd_path_to_full_path
 
 
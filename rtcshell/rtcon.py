@@ -30,14 +30,58 @@ from rtctree.exceptions import RtcTreeError, FailedToConnectError, \
                                WrongPortTypeError, \
                                MismatchedInterfacesError, \
                                MismatchedPolarityError
-from rtctree.tree import create_rtctree
 from rtctree.path import parse_path
 from rtctree.utils import build_attr_string, get_num_columns_and_rows, \
                           get_terminal_size
+import shlex
 import sys
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell.lazy import create_rtctree, server_paths
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import cmd_path_to_full_path
+from rtcshell.presets import check_port, get_preset
+
+
+def find_port(cmd_path, path, port, tree):
+    '''Find a port object in the tree.
+
+    Returns a (port object, error) tuple. The error is None if the port was
+    found, or a message saying why it was not.
+
+    '''
+    if not tree.has_path(path):
+        return None, 'Cannot access {0}: No such object.'.format(cmd_path)
+    comp = tree.get_node(path)
+    if not comp or not comp.is_component:
+        return None, 'Cannot access {0}: No such object'.format(cmd_path)
+    port_obj = comp.get_port_by_name(port)
+    if not port_obj:
+        return None, 'Cannot access {0}: No such port'.format(cmd_path)
+    return port_obj, None
+
+
+def connect(source_port_obj, dest_port_obj, name, id, props):
+    '''Connect two ports. Returns None, or a message if it failed.'''
+    from omniORB import CORBA
+    try:
+        source_port_obj.connect(dest_port_obj, name=name, id=id, props=props)
+    except IncompatibleDataPortConnectionPropsError:
+        return 'An incompatible data port property or property value was \
+given.'
+    except WrongPortTypeError:
+        return 'Mismatched port types.'
+    except MismatchedPolarityError:
+        return 'Service port polarities do not match.'
+    except MismatchedInterfacesError:
+        return 'Service port interfaces do not match.'
+    except FailedToConnectError:
+        return 'Failed to connect.'
+    except CORBA.Exception, e:
+        # A component that cannot be reached must not stop the other
+        # connections
+        return str(e) or e.__class__.__name__
+    return None
 
 
 def connect_ports(source_cmd_path, source_full_path,
@@ -69,57 +113,139 @@ specified'.format(sys.argv[0])
     if not tree:
         return 1
 
-    if not tree.has_path(source_path):
-        print >>sys.stderr, '{0}: Cannot access {1}: No such \
-object.'.format(sys.argv[0], source_cmd_path)
-        return 1
-    if not tree.has_path(dest_path):
-        print >>sys.stderr, '{0}: Cannot access {1}: No such \
-object.'.format(sys.argv[0], dest_cmd_path)
+    source_port_obj, error = find_port(source_cmd_path, source_path,
+                                       source_port, tree)
+    if not error:
+        dest_port_obj, error = find_port(dest_cmd_path, dest_path, dest_port,
+                                         tree)
+    if not error and options.preset:
+        error = check_port(options.properties, source_port_obj,
+                           source_cmd_path) or \
+                check_port(options.properties, dest_port_obj, dest_cmd_path)
+    if not error:
+        conn_name = options.name if options.name else None
+        error = connect(source_port_obj, dest_port_obj, conn_name,
+                        options.id, options.properties)
+    if error:
+        print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
         return 1
+    return 0
 
-    source_comp = tree.get_node(source_path)
-    if not source_comp or not source_comp.is_component:
-        print >>sys.stderr, '{0}: Cannot access {1}: No such \
-object'.format(sys.argv[0], source_cmd_path)
-        return 1
-    source_port_obj = source_comp.get_port_by_name(source_port)
-    if not source_port_obj:
-        print >>sys.stderr, '{0}: Cannot access {1}: No such \
-port'.format(sys.argv[0], source_cmd_path)
-        return 1
-    dest_comp = tree.get_node(dest_path)
-    if not dest_comp or not dest_comp.is_component:
-        print >>sys.stderr, '{0}: Cannot access {1}: No such \
-object'.format(sys.argv[0], dest_cmd_path)
-        return 1
-    dest_port_obj = dest_comp.get_port_by_name(dest_port)
-    if not dest_port_obj:
-        print >>sys.stderr, '{0}: Cannot access {1}: No such \
-port'.format(sys.argv[0], dest_cmd_path)
-        return 1
 
-    conn_name = options.name if options.name else None
+def read_manifest(filename, options):
+    '''Read a connection manifest.
+
+    Each line holds a source path, a destination path and any number of
+    property=value pairs, separated by white space and quoted as in a shell.
+    Blank lines and comments starting with # are ignored. Properties given
+    with --property apply to every connection, unless the line sets them
+    itself. Returns a list of (line number, source, destination, properties)
+    entries and a list of errors.
+
+    '''
+    if filename == '-':
+        lines = sys.stdin.readlines()
+    else:
+        f = open(filename, 'r')
+        try:
+            lines = f.readlines()
+        finally:
+            f.close()
+
+    entries = []
+    errors = []
+    for ii, line in enumerate(lines):
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError, e:
+            errors.append('{0}:{1}: {2}'.format(filename, ii + 1, e))
+            continue
+        if not words:
+            continue
+        if len(words) < 2:
+            errors.append('{0}:{1}: No destination path'.format(filename,
+                                                                 ii + 1))
+            continue
+        props = dict(options.properties)
+        for word in words[2:]:
+            if word.count('=') != 1:
+                errors.append('{0}:{1}: Bad property format: {2}'.format(
+                        filename, ii + 1, word))
+                continue
+            key, equals, value = word.partition('=')
+            props[key] = value
+        entries.append((ii + 1, words[0], words[1], props))
+    return entries, errors
+
+
+def connect_manifest(filename, options, tree=None):
+    '''Make all the connections listed in a manifest.
+
+    All the ports are found in a single tree and checked before any
+    connections are made; if any are missing, nothing is connected. The
+    connections are then made concurrently. A failed connection does not stop
+    the others.
+
+    '''
     try:
-        source_port_obj.connect(dest_port_obj, name=conn_name, id=options.id,
-                                props=options.properties)
-    except IncompatibleDataPortConnectionPropsError:
-        print >>sys.stderr, '{0}: An incompatible data port property or \
-property value was given.'.format(sys.argv[0])
+        entries, errors = read_manifest(filename, options)
+    except IOError, e:
+        print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
         return 1
-    except WrongPortTypeError:
-        print >>sys.stderr, '{0}: Mismatched port types.'.format(sys.argv[0])
-        return 1
-    except MismatchedPolarityError:
-        print >>sys.stderr, '{0}: Service port polarities do not \
-match.'.format(sys.argv[0])
-        return 1
-    except MismatchedInterfacesError:
-        print >>sys.stderr, '{0}: Service port interfaces do not \
-match.'.format(sys.argv[0])
+
+    # Check the paths, collecting them for the tree
+    endpoints = []
+    paths = []
+    for line, source, dest, props in entries:
+        ends = []
+        for cmd_path in [source, dest]:
+            path, port = parse_path(cmd_path_to_full_path(cmd_path))
+            if not port or not path[-1]:
+                errors.append('{0}:{1}: Bad port path: {2}'.format(filename,
+                        line, cmd_path))
+            ends.append((cmd_path, path, port))
+            paths.append(path)
+        endpoints.append(ends)
+    if not errors and entries:
+        if not tree:
+            tree = create_rtctree(paths=server_paths(paths))
+        if not tree:
+            return 1
+        port_objs = []
+        for (line, source, dest, props), ends in zip(entries, endpoints):
+            objs = []
+            for cmd_path, path, port in ends:
+                port_obj, error = find_port(cmd_path, path, port, tree)
+                if error:
+                    errors.append('{0}:{1}: {2}'.format(filename, line,
+                                                        error))
+                objs.append(port_obj)
+            if options.preset and objs[0] and objs[1]:
+                error = check_port(props, objs[0], source) or \
+                        check_port(props, objs[1], dest)
+                if error:
+                    errors.append('{0}:{1}: {2}'.format(filename, line,
+                                                        error))
+            port_objs.append(objs)
+    if errors:
+        for e in errors:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
+        print >>sys.stderr, '{0}: No connections made.'.format(sys.argv[0])
         return 1
-    except FailedToConnectError:
-        print >>sys.stderr, '{0}: Failed to connect.'.format(sys.argv[0])
+
+    results = parallel_map(lambda ii: connect(port_objs[ii][0],
+                                              port_objs[ii][1], None, '',
+                                              entries[ii][3]),
+                           range(len(entries)), options.jobs)
+    failed = 0
+    for (line, source, dest, props), error in zip(entries, results):
+        if error:
+            print >>sys.stderr, '{0}: {1}:{2}: {3} {4}: {5}'.format(
+                    sys.argv[0], filename, line, source, dest, error)
+            failed += 1
+    print '{0} connections made, {1} failed.'.format(len(entries) - failed,
+                                                     failed)
+    if failed:
         return 1
     return 0
 
@@ -138,7 +264,8 @@ def main(argv=None, tree=None):
         getattr(parser.values, option.dest)[key] = value
 
     usage = '''Usage: %prog [options] <source path> <destination path>
-Connect two ports.
+       %prog [options] -f <manifest>
+Connect two ports, or all the ports listed in a manifest file.
 
 ''' + RTSH_PATH_USAGE + '''
 
@@ -157,17 +284,45 @@ For service ports, the valid properties include:
 port.port_type
 
 Other properties may also be valid, depending on your OpenRTM
-implementation.'''
+implementation.
+
+A preset can be used to set several data port properties at once. The
+built-in presets are:
+    high-throughput  Deliver every sample, buffering bursts.
+    low-latency      Send each sample as soon as it is written.
+    lossy-latest     Only deliver the newest sample.
+More presets can be defined in the file given by the RTCSH_PRESETS
+environment variable (~/.config/rtcshell/presets.conf by default), with one
+section per preset holding its properties. Properties given with --property
+override those of the preset. The ports are checked to make sure they support
+the preset's data flow, interface and subscription types.
+
+Each line of a manifest holds a source path, a destination path and any
+number of properties for that connection, quoted as in a shell:
+    Camera0.rtc:out Viewer0.rtc:in dataport.subscription_type=new
+Blank lines and lines starting with # are ignored. Properties given with
+--property apply to every connection in the manifest. Use - to read the
+manifest from standard input. All the ports are checked before any are
+connected, and the connections are made concurrently.'''
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
     parser.add_option('-d', '--debug', dest='debug', action='store_true',
             default=False, help='Print debugging information. \
 [Default: %default]')
+    parser.add_option('-f', '--file', dest='manifest', action='store',
+            type='string', default=None, help='Make the connections listed \
+in a manifest file.')
     parser.add_option('-i', '--id', dest='id', action='store', type='string',
             default='', help='ID of the connection. [Default: %default]')
     parser.add_option('-n', '--name', dest='name', action='store',
             type='string', default=None,
             help='Name of the connection. [Default: %default]')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of manifest connections to \
+make at once. [Default: %default]')
+    parser.add_option('--preset', dest='preset', action='store',
+            type='string', default=None, help='Name of a preset of \
+connection properties.')
     parser.add_option('-p', '--property', dest='properties', action='callback',
             callback=property_callback, type='string',
             help=\
@@ -183,6 +338,19 @@ implementation.'''
 
     if not getattr(options, 'properties'):
         setattr(options, 'properties', {})
+    if options.preset:
+        props, error = get_preset(options.preset)
+        if error:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
+            return 1
+        props.update(options.properties)
+        options.properties = props
+
+    if options.manifest:
+        if args or options.id or options.name:
+            print >>sys.stderr, usage
+            return 1
+        return connect_manifest(options.manifest, options, tree)
 
     if len(args) != 2:
         print >>sys.stderr, usage
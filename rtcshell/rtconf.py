@@ -23,17 +23,20 @@ Implementation of the command to manage component configuration.
 # $Source$
 
 
+import ConfigParser
+import json
 from optparse import OptionParser, OptionError
 import os
 from rtctree.exceptions import RtcTreeError
-from rtctree.tree import create_rtctree, NoSuchConfSetError, \
-                         NoSuchConfParamError
 from rtctree.path import parse_path
 from rtctree.utils import build_attr_string, get_num_columns_and_rows, \
                           get_terminal_size
 import sys
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell.direct import get_node
+from rtcshell.lazy import create_rtctree, server_paths
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import cmd_path_to_full_path
 
 
@@ -91,12 +94,7 @@ object.'.format(sys.argv[0], cmd_path)
 object'.format(sys.argv[0], cmd_path)
         return 1
 
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        return 1
-
-    object = tree.get_node(path)
+    tree, object = get_node(path, tree, detached=True)
     if not object:
         print >>sys.stderr, '{0}: Cannot access {1}: No such \
 object.'.format(sys.argv[0], cmd_path)
@@ -115,6 +113,20 @@ component.'.format(sys.argv[0], cmd_path)
 
 def set_conf_value(set, param, new_value, cmd_path, full_path, options,
                    tree=None):
+    return set_conf_values({set: {param: new_value}}, cmd_path, full_path,
+                           options, tree)
+
+
+def set_conf_values(values, cmd_path, full_path, options, tree=None):
+    '''Set many configuration parameters of a component at once.
+
+    values is a dictionary of dictionaries, mapping set names to the new
+    values of parameters in that set. A set name of None means the active
+    set. All the names are checked before any values are set. The active set
+    is re-activated once, after all the values have been set, if any of its
+    parameters changed.
+
+    '''
     path, port = parse_path(full_path)
     if port:
         # Can't configure a port
@@ -129,12 +141,7 @@ object.'.format(sys.argv[0], cmd_path)
 object'.format(sys.argv[0], cmd_path)
         return 1
 
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        return 1
-
-    object = tree.get_node(path)
+    tree, object = get_node(path, tree, detached=True)
     if not object:
         print >>sys.stderr, '{0}: Cannot access {1}: No such \
 object.'.format(sys.argv[0], cmd_path)
@@ -144,25 +151,71 @@ object.'.format(sys.argv[0], cmd_path)
 component.'.format(sys.argv[0], cmd_path)
         return 1
 
-    if not set:
-        set = object.active_conf_set_name
-    try:
-        object.set_conf_set_value(set, param, new_value)
-    except NoSuchConfSetError, e:
-        print >>sys.stderr, '{0}: {1}: No such configuration \
-set'.format(sys.argv[0], e)
+    active = object.active_conf_set_name
+    merged = {}
+    # Values for the active set given without its name take precedence
+    for set in sorted(values.keys(), key=lambda s: s is None):
+        merged.setdefault(set or active, {}).update(values[set])
+    changes = []
+    failed = False
+    for set_name in sorted(merged.keys()):
+        if set_name not in object.conf_sets:
+            print >>sys.stderr, '{0}: {1}: No such configuration \
+set'.format(sys.argv[0], set_name)
+            failed = True
+            continue
+        for param in sorted(merged[set_name].keys()):
+            if param not in object.conf_sets[set_name].data:
+                print >>sys.stderr, '{0}: {1}: No such configuration \
+parameter'.format(sys.argv[0], param)
+                failed = True
+            changes.append((set_name, param, merged[set_name][param]))
+    if failed:
         return 1
-    except NoSuchConfParamError, e:
-        print >>sys.stderr, '{0}: {1}: No such configuration \
+
+    from rtctree.tree import NoSuchConfSetError, NoSuchConfParamError
+    for set_name, param, new_value in changes:
+        try:
+            object.set_conf_set_value(set_name, param, new_value)
+        except NoSuchConfSetError, e:
+            print >>sys.stderr, '{0}: {1}: No such configuration \
+set'.format(sys.argv[0], e)
+            failed = True
+        except NoSuchConfParamError, e:
+            print >>sys.stderr, '{0}: {1}: No such configuration \
 parameter'.format(sys.argv[0], e)
-    if set == object.active_conf_set_name:
-        # Re-activate the set to update the config param internally in the
+            failed = True
+    if active in [c[0] for c in changes]:
+        # Re-activate the set to update the config params internally in the
         # component.
-        object.activate_conf_set(set)
+        object.activate_conf_set(active)
 
+    if failed:
+        return 1
     return 0
 
 
+def read_param_file(filename, values):
+    '''Add the parameter values in a file to values.
+
+    The file is in the format read by ConfigParser, with one section for each
+    configuration set. Values already in values are not replaced.
+
+    '''
+    parser = ConfigParser.RawConfigParser()
+    # Parameter names are case sensitive
+    parser.optionxform = str
+    f = open(filename, 'r')
+    try:
+        parser.readfp(f)
+    finally:
+        f.close()
+    for section in parser.sections():
+        set_values = values.setdefault(section, {})
+        for param, value in parser.items(section):
+            set_values.setdefault(param, value)
+
+
 def activate_set(set_name, cmd_path, full_path, options, tree=None):
     path, port = parse_path(full_path)
     if port:
@@ -178,12 +231,7 @@ object.'.format(sys.argv[0], cmd_path)
 object'.format(sys.argv[0], cmd_path)
         return 1
 
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        return 1
-
-    object = tree.get_node(path)
+    tree, object = get_node(path, tree, detached=True)
     if not object:
         print >>sys.stderr, '{0}: Cannot access {1}: No such \
 object.'.format(sys.argv[0], cmd_path)
@@ -193,6 +241,7 @@ object.'.format(sys.argv[0], cmd_path)
 component.'.format(sys.argv[0], cmd_path)
         return 1
 
+    from rtctree.tree import NoSuchConfSetError
     try:
         object.activate_conf_set(set_name)
     except NoSuchConfSetError, e:
@@ -203,8 +252,237 @@ set'.format(sys.argv[0], e)
     return 0
 
 
+def is_single_set(args):
+    '''Check if the arguments to the set command set a single parameter.
+
+    Two or three arguments are an optional set name, a parameter name and a
+    value, which may contain equals signs, unless both the last two are
+    name=value pairs.
+
+    '''
+    return len(args) in (2, 3) and not ('=' in args[-2] and '=' in args[-1])
+
+
+def set_many(args, cmd_path, full_path, options, tree=None):
+    '''Set the parameters given as name=value pairs and in the file.'''
+    if args and '=' not in args[0]:
+        set = args[0]
+        args = args[1:]
+    else:
+        set = None
+    values = {}
+    for arg in args:
+        if arg.count('=') < 1:
+            print >>sys.stderr, '{0}: Bad parameter format: {1}'.format(
+                    sys.argv[0], arg)
+            return 1
+        param, equals, value = arg.partition('=')
+        values.setdefault(set, {})[param] = value
+    if options.param_file:
+        try:
+            read_param_file(options.param_file, values)
+        except (IOError, ConfigParser.Error), e:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
+            return 1
+    return set_conf_values(values, cmd_path, full_path, options, tree)
+
+
+def get_conf(object):
+    '''Get the configuration of a component as a dictionary.'''
+    sets = {}
+    for name, conf_set in object.conf_sets.items():
+        sets[name] = dict(conf_set.data)
+    return {'active_set': object.active_conf_set_name, 'sets': sets}
+
+
+def dump_conf_sets(cmd_path, full_path, options, tree=None):
+    '''Write the configuration of components as JSON.
+
+    With options.recurse, every component below the path is included. The
+    configurations are fetched concurrently. The result maps the full path
+    of each component to its active set name and the parameters of each of
+    its sets.
+
+    '''
+    path, port = parse_path(full_path)
+    if port:
+        # Can't configure a port
+        print >>sys.stderr, '{0}: Cannot access {1}: No such \
+object.'.format(sys.argv[0], cmd_path)
+        return 1
+    if not path[-1]:
+        path = path[:-1]
+
+    if not tree:
+        tree = create_rtctree(paths=path)
+    if not tree:
+        return 1
+    if not tree.has_path(path):
+        print >>sys.stderr, '{0}: Cannot access {1}: No such directory or \
+object.'.format(sys.argv[0], cmd_path)
+        return 1
+    node = tree.get_node(path)
+    if options.recurse:
+        components = node.iterate(lambda n, args: n, filter=['is_component'])
+    elif node.is_component:
+        components = [node]
+    else:
+        print >>sys.stderr, '{0}: Cannot access {1}: Not a component (use \
+-R to dump a directory).'.format(sys.argv[0], cmd_path)
+        return 1
+
+    from omniORB import CORBA
+    def get_result(object):
+        try:
+            return get_conf(object), None
+        except (CORBA.Exception, RtcTreeError), e:
+            return None, str(e) or e.__class__.__name__
+    results = parallel_map(get_result, components, options.jobs)
+    dump = {}
+    failed = False
+    for object, (conf, error) in zip(components, results):
+        if error:
+            print >>sys.stderr, '{0}: {1}: {2}'.format(sys.argv[0],
+                                                       object.full_path, error)
+            failed = True
+        else:
+            dump[object.full_path] = conf
+
+    if options.output and options.output != '-':
+        try:
+            f = open(options.output, 'w')
+        except IOError, e:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
+            return 1
+    else:
+        f = sys.stdout
+    try:
+        json.dump(dump, f, indent=2, sort_keys=True)
+        f.write('\n')
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    if failed:
+        return 1
+    return 0
+
+
+def encode_strings(value):
+    '''Convert the unicode strings read from JSON to UTF-8 encoded strings.'''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, dict):
+        return dict([(encode_strings(k), encode_strings(v)) \
+                     for k, v in value.items()])
+    elif isinstance(value, list):
+        return [encode_strings(v) for v in value]
+    return value
+
+
+def apply_conf(object, conf):
+    '''Make a component's configuration match a dumped configuration.
+
+    Only the parameters whose values differ are set, and the active set is
+    re-activated only if one of its parameters changed or a different set
+    should be active. Returns a description of the changes made, or None if
+    nothing changed, and an error message, which is None if all went well.
+
+    '''
+    live = get_conf(object)
+    changes = []
+    for set_name, params in sorted(conf.get('sets', {}).items()):
+        if set_name not in live['sets']:
+            return None, '{0}: No such configuration set'.format(set_name)
+        for param, value in sorted(params.items()):
+            if param not in live['sets'][set_name]:
+                return None, '{0}: No such configuration \
+parameter'.format(param)
+            if live['sets'][set_name][param] != value:
+                changes.append((set_name, param, value))
+    active = conf.get('active_set') or live['active_set']
+    if active not in live['sets']:
+        return None, '{0}: No such configuration set'.format(active)
+
+    result = []
+    for set_name, param, value in changes:
+        object.set_conf_set_value(set_name, param, value)
+    if changes:
+        result.append('{0} parameters changed'.format(len(changes)))
+    if active != live['active_set']:
+        object.activate_conf_set(active)
+        result.append('set {0} activated'.format(active))
+    elif active in [c[0] for c in changes]:
+        object.activate_conf_set(active)
+    return ', '.join(result) or None, None
+
+
+def apply_conf_file(filename, options, tree=None):
+    '''Apply a configuration dump to all the components in it.
+
+    The components are all found in a single tree, and are compared and
+    updated concurrently.
+
+    '''
+    try:
+        if filename == '-':
+            dump = json.load(sys.stdin)
+        else:
+            f = open(filename, 'r')
+            try:
+                dump = json.load(f)
+            finally:
+                f.close()
+        dump = encode_strings(dump)
+    except (IOError, ValueError), e:
+        print >>sys.stderr, '{0}: {1}: {2}'.format(sys.argv[0], filename, e)
+        return 1
+    if not isinstance(dump, dict):
+        print >>sys.stderr, '{0}: {1}: Not a configuration \
+dump'.format(sys.argv[0], filename)
+        return 1
+    if not dump:
+        return 0
+
+    full_paths = sorted(dump.keys())
+    paths = [parse_path(p)[0] for p in full_paths]
+    if not tree:
+        tree = create_rtctree(paths=server_paths(paths))
+    if not tree:
+        return 1
+
+    from omniORB import CORBA
+    def apply(ii):
+        if not tree.has_path(paths[ii]):
+            return None, 'No such object.'
+        object = tree.get_node(paths[ii])
+        if not object.is_component:
+            return None, 'Not a component.'
+        try:
+            return apply_conf(object, dump[full_paths[ii]])
+        except (CORBA.Exception, RtcTreeError), e:
+            return None, str(e) or e.__class__.__name__
+    results = parallel_map(apply, range(len(paths)), options.jobs)
+    changed = 0
+    failed = 0
+    for full_path, (message, error) in zip(full_paths, results):
+        if error:
+            print >>sys.stderr, '{0}: {1}: {2}'.format(sys.argv[0], full_path,
+                                                       error)
+            failed += 1
+        elif message:
+            print '{0}: {1}'.format(full_path, message)
+            changed += 1
+    print '{0} components changed, {1} unchanged, {2} failed.'.format(
+            changed, len(full_paths) - changed - failed, failed)
+    if failed:
+        return 1
+    return 0
+
+
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <path> [command] [args]
+       %prog [options] dump [-R] <path>
+       %prog [options] apply <file>
 Display and edit configuration parameters and sets.
 
 A command should be one of:
@@ -218,10 +496,29 @@ arguments. If only two arguments are given, the parameter is changed in the
 currently active configuration set. For example:
     set outdoor max_speed 4
     set max_speed 2
+Many parameters can be changed at once by giving them as name=value pairs,
+after an optional set name:
+    set outdoor max_speed=4 max_accel=1.5
+    set max_speed=2 max_accel=0.5
+Parameters can also be read from a file with --file. The file holds one
+section for each configuration set, with one "name = value" line for each
+parameter. Values given on the command line replace those in the file. All
+the parameter names are checked before any are changed, and the active set is
+re-activated only once, after all the values have been set. A value given
+after the parameter name, as in the first form, may contain equals signs:
+    set filter a=b
+Two or three arguments are read as pairs only if the last two both contain an
+equals sign.
 
 The act command requires a single argument: the name of a configuration
 set to activate.
 
+The dump command writes the configuration of the component at a path, or with
+-R of every component below it, as JSON. The apply command makes the
+configuration of the components in such a dump match it again. Only the
+parameters that differ are set, and only components with changes are
+re-activated. Both commands work on many components concurrently.
+
 ''' + RTSH_PATH_USAGE
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
@@ -230,6 +527,18 @@ set to activate.
     parser.add_option('-d', '--debug', dest='debug', action='store_true',
             default=False, help='Print debugging information. \
 [Default: %default]')
+    parser.add_option('-f', '--file', dest='param_file', action='store',
+            type='string', default=None, help='File of parameter values to \
+set.')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of components to dump or \
+apply at once. [Default: %default]')
+    parser.add_option('-o', '--output', dest='output', action='store',
+            type='string', default=None, help='File to write the dump to. \
+[Default: standard output]')
+    parser.add_option('-R', '--recurse', dest='recurse', action='store_true',
+            default=False, help='Dump all the components below the path. \
+[Default: %default]')
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -239,12 +548,28 @@ set to activate.
         print 'OptionError:', e
         return 1
 
+    if args and args[0] == 'dump':
+        if len(args) > 2:
+            print >>sys.stderr, usage
+            return 1
+        cmd_path = ''.join(args[1:])
+        return dump_conf_sets(cmd_path, cmd_path_to_full_path(cmd_path),
+                              options, tree)
+    elif args and args[0] == 'apply':
+        if len(args) != 2:
+            print >>sys.stderr, usage
+            return 1
+        return apply_conf_file(args[1], options, tree)
+
     if not args:
         print >>sys.stderr, usage
         return 1
     elif len(args) == 1:
         cmd_path = args[0]
-        cmd = 'list'
+        if options.param_file:
+            cmd = 'set'
+        else:
+            cmd = 'list'
         args = args[1:]
     else:
         cmd_path = args[0]
@@ -257,7 +582,9 @@ set to activate.
         return print_conf_sets(cmd_path, full_path, options, tree)
     elif cmd == 'set':
         # Need to get more arguments
-        if len(args) == 2:
+        if options.param_file or not is_single_set(args):
+            return set_many(args, cmd_path, full_path, options, tree)
+        elif len(args) == 2:
             set = None
             param = args[0]
             new_value = args[1]
@@ -39,7 +39,8 @@ def deactivate_action(object, ec_index):
 
 
 def main(argv=None, tree=None):
-    return base_main('Deactivate a component.', deactivate_action, argv)
+    return base_main('Deactivate a component.', deactivate_action, argv, tree,
+                     'INACTIVE')
 
 
 # vim: tw=79
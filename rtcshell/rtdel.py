@@ -26,14 +26,22 @@ Implementation of deleting an object from a name server.
 from optparse import OptionParser, OptionError
 import os
 from rtctree.exceptions import RtcTreeError, BadPathError
-from rtctree.tree import create_rtctree
 from rtctree.path import parse_path
 import sys
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell import cache
+from rtcshell import deadline
+from rtcshell.lazy import create_rtctree
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import cmd_path_to_full_path
 
 
+DEFAULT_PROBE_TIMEOUT = 1.0
+STALE = 'stale'
+UNREACHABLE = 'unreachable'
+
+
 def delete_object_reference(cmd_path, full_path, options, tree=None):
     path, port = parse_path(full_path)
     if port:
@@ -76,6 +84,129 @@ managers.'.format(sys.argv[0], cmd_path)
         print >>sys.stderr, '{0}: {1}: No such name registered.'.format(\
                 sys.argv[0], cmd_path)
         return 1
+    # The parent's cached listing no longer matches the name server
+    cache.invalidate('/' + '/'.join(path[1:-1]))
+    return 0
+
+
+def find_bindings(path, recurse, jobs):
+    '''Get the naming entries of the objects bound at or below a path.
+
+    Naming contexts are searched, but not checked themselves. Managers are
+    not asked for their components, as those are not bound in a name server.
+    Returns None if there is nothing at the path.
+
+    '''
+    from rtcshell import naming
+    if len(path) < 2:
+        tops = naming.get_root_entries(path)
+    else:
+        entry = naming.get_entry(path)
+        if not entry:
+            return None
+        tops = [entry]
+    if recurse:
+        max_depth = 0
+    else:
+        max_depth = 1
+    result = []
+    for top in tops:
+        for e in naming.walk(top, max_depth=max_depth, descend_managers=False,
+                             jobs=jobs):
+            if not e.is_directory:
+                result.append(e)
+    return result
+
+
+def check_binding(entry):
+    '''Check if the object bound to a name still exists.
+
+    Returns STALE if the object's server says it does not exist or the
+    reference is nil, UNREACHABLE if the object could not be reached before
+    the deadline, and None if it exists or the name is no longer bound. An
+    object that cannot be reached may only be on a busy host, so it is not
+    considered stale.
+
+    '''
+    import CosNaming
+    from omniORB import CORBA
+    try:
+        object = entry.object
+        if CORBA.is_nil(object) or object._non_existent():
+            return STALE
+    except CosNaming.NamingContext.NotFound:
+        pass
+    except CORBA.OBJECT_NOT_EXIST:
+        return STALE
+    except deadline.unreachable_errors():
+        return UNREACHABLE
+    return None
+
+
+def unbind_entry(entry):
+    '''Remove an entry's name from its parent naming context.
+
+    Returns None on success, or a message saying why it failed.
+
+    '''
+    import CosNaming
+    from omniORB import CORBA
+    from rtcshell.naming import split_name
+    id, kind = split_name(entry.name)
+    try:
+        entry.parent.object.unbind([CosNaming.NameComponent(id, kind)])
+    except CosNaming.NamingContext.NotFound:
+        return '{0}: No such name registered.'.format(entry.full_path)
+    except CORBA.Exception, e:
+        return '{0}: Could not unbind: {1}'.format(entry.full_path, e)
+    return None
+
+
+def delete_stale_references(cmd_path, full_path, options):
+    path, port = parse_path(full_path)
+    if port:
+        print >>sys.stderr, '{0}: Cannot access {1}: Cannot delete \
+ports.'.format(sys.argv[0], cmd_path)
+        return 1
+    if not path[-1]:
+        path = path[:-1]
+
+    # Listing a context on a dead host must not take longer than the checks
+    deadline.set_timeout(options.timeout)
+    entries = find_bindings(path, options.recurse, options.jobs)
+    if entries is None:
+        print >>sys.stderr, '{0}: Cannot access {1}: No such directory or \
+object.'.format(sys.argv[0], cmd_path)
+        return 1
+
+    results = parallel_map(check_binding, entries, options.jobs)
+    stale = [e for e, r in zip(entries, results) if r == STALE]
+    unreachable = [e for e, r in zip(entries, results) if r == UNREACHABLE]
+    for e, r in zip(entries, results):
+        if r == STALE:
+            print e.full_path
+        elif r == UNREACHABLE:
+            print '{0} (unreachable)'.format(e.full_path)
+    summary = '{0} names checked, {1} stale, {2} unreachable'.format(
+            len(entries), len(stale), len(unreachable))
+    if options.dry_run:
+        print summary + '.'
+        return 0
+
+    targets = stale
+    if options.unreachable:
+        targets = [e for e, r in zip(entries, results) if r]
+    errors = parallel_map(unbind_entry, targets, options.jobs)
+    for parent in set([e.parent.full_path for e in targets]):
+        # The parents' cached listings no longer match the name servers
+        cache.invalidate(parent)
+    for error in errors:
+        if error:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
+    unbound = len([e for e in errors if not e])
+    print '{0}, {1} unbound.'.format(summary, unbound)
+    if unbound != len(targets):
+        return 1
     return 0
 
 
@@ -87,12 +218,40 @@ This command is particularly useful to remove zombie registrations. However,
 care must be taken not to unlink a large section of the tree, as you will not
 be able to get it back.
 
+With --stale, the object at the path, or the objects in the directory at the
+path, are checked instead, and the names of those that no longer exist are
+deleted. Objects that cannot be reached in time are listed as unreachable,
+but their names are only deleted if --unreachable is also given, as they may
+just be on a busy host. Use -R to check the whole tree below a directory, and
+-n to only list the names.
+
 ''' + RTSH_PATH_USAGE
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
     parser.add_option('-d', '--debug', dest='debug', action='store_true',
             default=False, help='Print debugging information. \
 [Default: %default]')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of objects to check at once \
+with --stale. [Default: %default]')
+    parser.add_option('-n', '--dry-run', dest='dry_run', action='store_true',
+            default=False, help='List the stale names found with --stale \
+without deleting them. [Default: %default]')
+    parser.add_option('-R', '--recurse', dest='recurse', action='store_true',
+            default=False, help='Check all the objects below the directory \
+with --stale. [Default: %default]')
+    parser.add_option('--stale', dest='stale', action='store_true',
+            default=False, help='Delete the names of objects that no longer \
+exist. [Default: %default]')
+    parser.add_option('--unreachable', dest='unreachable',
+            action='store_true', default=False, help='With --stale, also \
+delete the names of objects that cannot be reached. [Default: %default]')
+    parser.add_option('-t', '--timeout', dest='timeout', action='store',
+            type='float',
+            default=deadline.get_timeout() or DEFAULT_PROBE_TIMEOUT,
+            help='Number of seconds to wait for each object to answer with \
+--stale. [Default: the value of {0}, or {1}]'.format(deadline.ENV_VAR,
+                DEFAULT_PROBE_TIMEOUT))
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -102,6 +261,18 @@ be able to get it back.
         print 'OptionError:', e
         return 1
 
+    if options.stale:
+        if not args:
+            cmd_path = ''
+        elif len(args) == 1:
+            cmd_path = args[0]
+        else:
+            print >>sys.stderr, usage
+            return 1
+        return delete_stale_references(cmd_path,
+                                       cmd_path_to_full_path(cmd_path),
+                                       options)
+
     if not args:
         # If no path given then can't do anything.
         print >>sys.stderr, '{0}: No object specified.'.format(sys.argv[0])
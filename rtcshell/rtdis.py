@@ -26,14 +26,17 @@ Implementation of the command to disconnect ports.
 from optparse import OptionParser, OptionError
 import os
 from rtctree.exceptions import RtcTreeError
-from rtctree.tree import create_rtctree
 from rtctree.path import parse_path
 from rtctree.utils import build_attr_string, get_num_columns_and_rows, \
                           get_terminal_size
 import sys
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell.direct import get_node
+from rtcshell.lazy import create_rtctree, server_paths
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import ENV_VAR, cmd_path_to_full_path
+from rtcshell.pattern import expand_glob, is_glob
 
 
 def disconnect_all(cmd_path, full_path, options, tree=None):
@@ -44,12 +47,7 @@ def disconnect_all(cmd_path, full_path, options, tree=None):
                                                                cmd_path)
         return 1
 
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        return 1
-
-    object = tree.get_node(path)
+    tree, object = get_node(path, tree)
     if not object:
         print >>sys.stderr, '{0}: Cannot access {1}: No such \
 object.'.format(sys.argv[0], cmd_path)
@@ -144,18 +142,123 @@ port'.format(sys.argv[0], dest_cmd_path)
     return 0
 
 
+def find_connections(components, port=None, seen=None):
+    '''Get the connections of some components, without duplicates.
+
+    Each connection appears on every port it joins, so connections are
+    identified by their ID. If port is given, only the connections of the
+    ports with that name are found. Connections with IDs in seen are
+    skipped, and the IDs of those found are added to it.
+
+    '''
+    result = []
+    if seen is None:
+        seen = set()
+    for c in components:
+        for p in c.ports:
+            if port and p.name != port:
+                continue
+            for conn in p.connections:
+                if conn.id not in seen:
+                    seen.add(conn.id)
+                    result.append(conn)
+    return result
+
+
+def disconnect_many(cmd_paths, options, tree=None):
+    '''Remove all the connections of many components at once.
+
+    The paths may contain wildcards. With options.recurse, every component
+    below each path is included. All the connections are found in a single
+    tree and removed concurrently.
+
+    '''
+    targets = []
+    for cmd_path in cmd_paths:
+        path, port = parse_path(cmd_path_to_full_path(cmd_path))
+        if not path[-1]:
+            path = path[:-1]
+        targets.append((cmd_path, path, port))
+
+    if not tree:
+        # Wildcards in the name server's place cannot be used to find servers
+        tree_paths = server_paths([p for c, p, port in targets \
+                                   if not is_glob(''.join(p[1:2]))])
+        tree = create_rtctree(paths=tree_paths or ['/'])
+    if not tree:
+        return 1
+
+    conns = []
+    seen = set()
+    for cmd_path, path, port in targets:
+        if is_glob(cmd_path):
+            paths = [parse_path(m)[0] for m in expand_glob(tree, path)]
+        elif tree.has_path(path):
+            paths = [path]
+        else:
+            paths = []
+        if not paths:
+            print >>sys.stderr, '{0}: Cannot access {1}: No such directory \
+or object.'.format(sys.argv[0], cmd_path)
+            return 1
+        components = []
+        for p in paths:
+            node = tree.get_node(p)
+            if options.recurse:
+                components += node.iterate(lambda n, args: n,
+                                           filter=['is_component'])
+            elif node.is_component:
+                components.append(node)
+        conns += find_connections(components, port, seen)
+
+    from omniORB import CORBA
+    def disconnect(conn):
+        try:
+            conn.disconnect()
+        except (CORBA.Exception, RtcTreeError), e:
+            return str(e) or e.__class__.__name__
+        return None
+    errors = parallel_map(disconnect, conns, options.jobs)
+    failed = 0
+    for conn, error in zip(conns, errors):
+        if error:
+            print >>sys.stderr, '{0}: Failed to disconnect {1} ({2}): \
+{3}'.format(sys.argv[0], conn.id,
+            ' '.join([name for name, p in conn.ports]), error)
+            failed += 1
+    print '{0} connections found, {1} disconnected, {2} failed.'.format(
+            len(conns), len(conns) - failed, failed)
+    if failed:
+        return 1
+    return 0
+
+
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <source path> [destination path]
+       %prog [options] -R <path> [path...]
 Disconnect two ports, or all connections from a component or port.
 
 ''' + RTSH_PATH_USAGE + '''
 
-Ports are specified at the end of each path, preceeded by a colon (:).'''
+Ports are specified at the end of each path, preceeded by a colon (:).
+
+With --recurse, all the connections of every component below the given paths
+are removed. The * and ? wildcards may be used in any part of a path to match
+the objects at that level of the tree; quote them to stop the shell expanding
+them. A port given after a wildcard path limits the disconnection to ports
+with that name. Each connection is only disconnected once, even if both its
+ends were found, and the connections are removed concurrently.'''
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
     parser.add_option('-d', '--debug', dest='debug', action='store_true',
             default=False, help='Print debugging information. \
 [Default: %default]')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of connections to remove at \
+once. [Default: %default]')
+    parser.add_option('-R', '--recurse', dest='recurse', action='store_true',
+            default=False, help='Disconnect all the components below the \
+given paths. [Default: %default]')
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -165,7 +268,12 @@ Ports are specified at the end of each path, preceeded by a colon (:).'''
         print 'OptionError:', e
         return 1
 
-    if len(args) == 1:
+    if options.recurse or [a for a in args if is_glob(a)]:
+        if not args:
+            print >>sys.stderr, usage
+            return 1
+        return disconnect_many(args, options, tree)
+    elif len(args) == 1:
         # Disconnect all
         cmd_path = args[0]
         return disconnect_all(cmd_path, cmd_path_to_full_path(cmd_path),
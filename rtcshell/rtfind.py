@@ -25,18 +25,170 @@ Implementation of the command to find components, managers, etc.
 
 from optparse import OptionParser, OptionError
 import os
-import re
+import shlex
 from rtctree.exceptions import RtcTreeError
-from rtctree.tree import create_rtctree, InvalidServiceError, \
-                         FailedToNarrowRootNamingError, \
-                         NonRootPathError
 from rtctree.path import parse_path
 from rtctree.utils import build_attr_string, get_num_columns_and_rows, \
                           get_terminal_size
 import sys
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell import deadline
+from rtcshell.lazy import create_rtctree, server_paths
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import cmd_path_to_full_path
+from rtcshell.pattern import GlobMatcher
+
+
+def walk_tree(node, max_depth=0, depth=0, descend_managers=True):
+    '''Generator that walks an RTC tree, depth first, from node.
+
+    If max_depth is greater than zero, nodes more than max_depth levels below
+    node are not visited. If descend_managers is False, the children of
+    managers are not visited.
+
+    '''
+    yield node
+    if max_depth > 0 and depth >= max_depth:
+        return
+    if node.is_manager and not descend_managers:
+        return
+    for child in node.children:
+        for result in walk_tree(child, max_depth, depth + 1,
+                                descend_managers):
+            yield result
+
+
+def type_matcher(types):
+    '''Make a predicate that checks a node's type against the --type string.
+
+    The node type is determined from its naming binding, so this predicate
+    does not need to contact the object.
+
+    '''
+    def matches_type(node):
+        if node.is_component:
+            return 'c' in types
+        if node.is_manager:
+            return 'm' in types or 'd' in types
+        if node.is_nameserver:
+            return 'n' in types or 'd' in types
+        if node.is_directory:
+            return 'd' in types
+        return True
+    return matches_type
+
+
+def name_predicate(matcher):
+    '''Make a predicate that checks a node's path against name patterns.
+
+    The path is known from the naming bindings, so this predicate does not
+    need to contact the object.
+
+    '''
+    def matches_name(node):
+        return matcher.search(node.full_path) is not None
+    return matches_name
+
+
+def plan_search(path, options, name_matcher):
+    '''Plan how to carry out a search.
+
+    The predicates are ordered so that the cheapest are checked first. The
+    parts of the tree where no match is possible are excluded from the walk:
+    managers are only asked for their components if components are being
+    searched for, and the walk stops at the name servers if they are the only
+    type being searched for.
+
+    Returns a tuple of (predicates, maximum depth, descend into managers,
+    search root only).
+
+    '''
+    predicates = [type_matcher(options.type)]
+    if name_matcher:
+        predicates.append(name_predicate(name_matcher))
+
+    max_depth = options.max_depth
+    root_only = False
+    if not [t for t in options.type if t in 'cdm']:
+        # Only name servers can match, and they are all directly below the
+        # root directory.
+        if len(path) == 1:
+            if max_depth <= 0 or max_depth > 1:
+                max_depth = 1
+        else:
+            root_only = True
+    descend_managers = 'c' in options.type
+    return predicates, max_depth, descend_managers, root_only
+
+
+def get_exec_action(action, options):
+    '''Make a function that carries out an --exec action on one path.
+
+    The function takes a full path and a tree, and returns the result of the
+    command function that implements the action. Returns None if the action
+    is not valid.
+
+    '''
+    args = shlex.split(action)
+    if not args:
+        return None
+    cmd = args[0]
+    args = args[1:]
+    # The commands are only imported when an action is used
+    from rtcshell.rtact import activate_action
+    from rtcshell.rtconf import set_conf_value
+    from rtcshell.rtdeact import deactivate_action
+    from rtcshell.rtdel import delete_object_reference
+    from rtcshell.rtdis import disconnect_all
+    from rtcshell.rtreset import reset_action
+    from rtcshell.state_control_base import alter_component_state
+    if cmd == 'act' and not args:
+        return lambda p, t: alter_component_state(activate_action, p, p,
+                                                  options, t)
+    elif cmd == 'deact' and not args:
+        return lambda p, t: alter_component_state(deactivate_action, p, p,
+                                                  options, t)
+    elif cmd == 'reset' and not args:
+        return lambda p, t: alter_component_state(reset_action, p, p,
+                                                  options, t)
+    elif cmd == 'dis' and not args:
+        return lambda p, t: disconnect_all(p, p, options, t)
+    elif cmd == 'del' and not args:
+        return lambda p, t: delete_object_reference(p, p, options, t)
+    elif cmd == 'conf' and args and args[0] == 'set':
+        if len(args) == 3:
+            set = None
+            param, value = args[1:]
+        elif len(args) == 4:
+            set, param, value = args[1:]
+        else:
+            return None
+        return lambda p, t: set_conf_value(set, param, value, p, p,
+                                           options, t)
+    return None
+
+
+def exec_on_matches(action, paths, options, tree=None):
+    '''Carry out an --exec action on every path in paths.
+
+    A single tree is used for all the actions. If no tree is given, one is
+    created from the name servers of the matched paths, each parsed once.
+    The actions are carried out concurrently, using up to options.jobs
+    worker threads.
+
+    '''
+    if not paths:
+        return 0
+    if not tree:
+        tree = create_rtctree(paths=server_paths([parse_path(p)[0] \
+                                                  for p in paths]))
+    if not tree:
+        return 1
+    results = parallel_map(lambda p: action(p, tree), paths, options.jobs)
+    if [r for r in results if r]:
+        return 1
+    return 0
 
 
 def search(cmd_path, full_path, options, tree=None, returnvalue=None):
@@ -45,7 +197,7 @@ def search(cmd_path, full_path, options, tree=None, returnvalue=None):
         # Can't search in a port
         print >>sys.stderr, '{0}: Cannot access {1}: No such directory or \
 object.'.format(sys.argv[0], cmd_path)
-        if returnvalue == 'list':
+        if returnvalue == 'list' or returnvalue == 'iter':
             return None
         else:
             return 1
@@ -56,50 +208,56 @@ object.'.format(sys.argv[0], cmd_path)
         trailing_slash = True
         path = path[:-1]
 
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        if returnvalue == 'list':
-            return None
-        else :
-            return 1        
-
-    # Find the root node of the search
-    root = tree.get_node(path)
-    if not root:
+    # Find the root node of the search. If no tree was given, the name
+    # servers are walked directly rather than building a tree, so that
+    # contexts below the maximum depth are never listed.
+    from rtcshell import naming
+    if tree:
+        root = tree.get_node(path)
+    elif len(path) == 1:
+        # The root directory is made up of the known name servers
+        root = None
+        roots = naming.get_root_entries(path)
+    else:
+        root = naming.get_entry(path)
+    if not root and (tree or len(path) > 1):
         print >>sys.stderr, '{0}: Cannot access {1}: No such directory or \
 object.'.format(sys.argv[0], cmd_path)
-        if returnvalue == 'list':
+        if returnvalue == 'list' or returnvalue == 'iter':
             return None
         else :
             return 1
-    if root.is_component and trailing_slash:
+    if root and root.is_component and trailing_slash:
         # If there was a trailing slash, complain that a component is not a
         # directory.
         print >>sys.stderr, '{0}: cannot access {1}: Not a directory.'.format(\
-                sys.argv[0], address)
-        if returnvalue == 'list':
+                sys.argv[0], cmd_path)
+        if returnvalue == 'list' or returnvalue == 'iter':
             return None
         else :
             return 1
 
-    name_res = []
-    for name in options.name:
-        # Replace regex special characters
-        name = re.escape (name)
-        # * goes to .*?
-        name = name.replace (r'\*', '.*?')
-        # ? goes to .
-        name = name.replace (r'\?', r'.')
-        name_res.append(re.compile(name))
-    for name in options.iname:
-        # Replace regex special characters
-        name = re.escape (name)
-        # * goes to .*?
-        name = name.replace (r'\*', '.*?')
-        # ? goes to .
-        name = name.replace (r'\?', r'.')
-        name_res.append(re.compile(name, re.IGNORECASE))
+    name_matcher = GlobMatcher(options.name, options.iname)
+
+    predicates, max_depth, descend_managers, root_only = \
+            plan_search(path, options, name_matcher)
+    if root_only:
+        nodes = [root]
+    elif tree:
+        nodes = walk_tree(root, max_depth,
+                          descend_managers=descend_managers)
+    elif root:
+        nodes = naming.walk(root, max_depth,
+                            descend_managers=descend_managers,
+                            jobs=options.jobs)
+    else:
+        def walk_roots():
+            for ns in roots:
+                for entry in naming.walk(ns, max_depth, depth=1,
+                        descend_managers=descend_managers,
+                        jobs=options.jobs):
+                    yield entry
+        nodes = walk_roots()
 
     def get_result(node, args):
         if node.full_path.startswith(cmd_path):
@@ -111,60 +269,102 @@ object.'.format(sys.argv[0], cmd_path)
         else:
             return node.full_path
     def matches_search(node):
-        # Filter out types
-        if node.is_component and 'c' not in options.type:
-            return False
-        if node.is_manager and 'm' not in options.type and \
-                'd' not in options.type:
-            return False
-        if node.is_nameserver and 'n' not in options.type and \
-                'd' not in options.type:
-            return False
-        if node.is_directory and 'd' not in options.type and \
-                (not node.is_nameserver and not node.is_manager):
-            return False
-        if not name_res:
-            return True
-        # Check for name matches
-        for name_re in name_res:
-            if name_re.search(node.full_path):
-                return True
-        return False
-    matches = root.iterate(get_result, filter=[matches_search])
-    
-    if returnvalue == 'list':
+        for p in predicates:
+            if not p(node):
+                return False
+        return True
+
+    # Matches are produced as the walk finds them, so results can be used
+    # before the walk of the whole tree has finished.
+    matches = (get_result(n, None) for n in nodes if matches_search(n))
+
+    if options.exec_action:
+        action = get_exec_action(options.exec_action, options)
+        if not action:
+            print >>sys.stderr, '{0}: Bad action: {1}'.format(sys.argv[0],
+                    options.exec_action)
+            if returnvalue == 'list' or returnvalue == 'iter':
+                return None
+            else:
+                return 1
+        # The actions need full paths, regardless of how the search path was
+        # given.
+        found = [n for n in nodes if matches_search(n)]
+        result = exec_on_matches(action, [n.full_path for n in found],
+                                 options, tree)
+        if returnvalue == 'list':
+            return [get_result(n, None) for n in found]
+        elif returnvalue == 'iter':
+            return (get_result(n, None) for n in found)
+        return result
+    elif returnvalue == 'list':
+        return list(matches)
+    elif returnvalue == 'iter':
         return matches
     else :
+        if options.print0:
+            terminator = '\0'
+        else:
+            terminator = '\n'
         for m in matches:
-            print m
+            sys.stdout.write(m + terminator)
+            sys.stdout.flush()
         return 0
 
+
 def main(argv=None, tree=None, returnvalue=None):
     usage = '''Usage: %prog <search path> [options]
 Find entries in the RTC tree matching given constraints.
 
 Equivalent to the UNIX 'find' command.
 
+Instead of printing the matches, an action can be carried out on each of them
+using the --exec option. All actions are carried out within this process,
+using a single RTC tree. The action should be one of:
+    act, deact, reset, dis, del, conf set [set] <param> <value>
+These are equivalent to the rtact, rtdeact, rtreset, rtdis, rtdel and rtconf
+commands. For example:
+    %prog /localhost --type c --name 'Motor*' --exec act
+    %prog /localhost --type c --exec 'conf set max_speed 2'
+
 ''' + RTSH_PATH_USAGE
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
     parser.add_option('-d', '--debug', dest='debug', action='store_true',
             default=False, help='Print debugging information. \
 [Default: %default]')
+    parser.add_option('-e', '--exec_context', dest='ec_index', type='int',
+            action='store', default=0, help='Index of the execution context \
+to use for the act, deact and reset actions. [Default: %default]')
+    parser.add_option('--exec', dest='exec_action', action='store',
+            type='string', default='', help='Action to carry out on each \
+match, instead of printing it. See above for the list of actions.')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of objects to search or --exec \
+actions to carry out at once. [Default: %default]')
     parser.add_option('--maxdepth', dest='max_depth', action='store',
                       type='int', default=0,
-                      help='Maximum depth to search down to in the tree. Set \
-to 0 to disable. [Default: %default]')
+                      help='Maximum depth to search down to in the tree, \
+relative to the search path. Naming contexts below this depth are not \
+searched. Set to 0 to disable. [Default: %default]')
     parser.add_option('--iname', dest='iname', action='append', type='string',
                       default=[], help='Case-insensitive name pattern. This \
 option can be specified multiple times.')
     parser.add_option('--name', dest='name', action='append', type='string',
                       default=[], help='Case-sensitive name pattern. This \
 option can be specified multiple times.')
+    parser.add_option('-0', '--print0', dest='print0', action='store_true',
+                      default=False, help='Separate results with a null \
+character instead of a new line, for use with "xargs -0". \
+[Default: %default]')
     parser.add_option('--type', dest='type', action='store', type='string',
-                      help='Type of object: c (component), d (directory), m \
-(manager), n (name server). Multiple types can be specified in a single entry, \
-e.g. "--type dmn".')
+                      default='cdmn', help='Type of object: c (component), \
+d (directory), m (manager), n (name server). Multiple types can be specified \
+in a single entry, e.g. "--type dmn". [Default: %default]')
+    parser.add_option('--timeout', dest='timeout', action='store',
+                      type='float', default=None, help='Number of seconds to \
+wait for each call to an object. Objects that do not answer in time are \
+skipped. [Default: the value of {0}, or no limit]'.format(deadline.ENV_VAR))
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -172,16 +372,17 @@ e.g. "--type dmn".')
         options, args = parser.parse_args()
     except OptionError, e:
         print 'OptionError:', e
-        if returnvalue == 'list':
+        if returnvalue == 'list' or returnvalue == 'iter':
             return None
         else :
             return 1
+    deadline.set_timeout(options.timeout)
 
     if len(args) == 1:
         cmd_path = args[0]
     else:
         print >>sys.stderr, usage
-        if returnvalue == 'list':
+        if returnvalue == 'list' or returnvalue == 'iter':
             return None
         else:
             return 1
@@ -24,20 +24,15 @@ port of a component.
 # $Source$
 
 
-from omniORB import any, cdrMarshal, CORBA
 from optparse import OptionParser, OptionError
 import os
 from rtctree.exceptions import RtcTreeError
-from rtctree.tree import create_rtctree
 from rtctree.path import parse_path
-from OpenRTM import PORT_OK
-from OpenRTM__POA import InPortCdr
-import RTC
-import SDOPackage
 import sys
 import time
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell.lazy import create_rtctree
 from rtcshell.path import cmd_path_to_full_path
 
 
@@ -56,6 +51,14 @@ def inject_data(cmd_path, full_path, options, data, tree):
                 sys.argv[0], cmd_path)
         return 1
 
+    # The CORBA and OpenRTM-aist modules are only needed from here on, and
+    # are slow to import.
+    from omniORB import any, cdrMarshal, CORBA
+    from OpenRTM import PORT_OK
+    from OpenRTM__POA import InPortCdr
+    import RTC
+    import SDOPackage
+
     if not tree:
         tree = create_rtctree(paths=path)
     if not tree:
@@ -117,6 +120,7 @@ your data type matches the port.'.format(sys.argv[0])
 
 def replace_time(string):
     '''Replaces any occurances with %time% with the system time.'''
+    import RTC
     now = time.time()
     sys_time = RTC.Time(int(now), int((now - int(now)) * 1e9))
     return string.format(time=sys_time)
@@ -156,6 +160,8 @@ any checks. You should not give access to this command to untrusted people.
 
     cmd_path = args[0]
     full_path = cmd_path_to_full_path(cmd_path)
+    # The expression is evaluated with the RTC module available to it
+    import RTC
     data = eval(replace_time(args[1]))
 
     return inject_data(cmd_path, full_path, options, data, tree)
@@ -26,160 +26,118 @@ Implementation of the command to list naming contexts.
 from optparse import OptionParser, OptionError
 import os
 from rtctree.exceptions import RtcTreeError
-from rtctree.tree import create_rtctree, InvalidServiceError, \
-                         FailedToNarrowRootNamingError, \
-                         NonRootPathError
 from rtctree.path import parse_path
 from rtctree.utils import build_attr_string, colour_supported, \
                           get_num_columns_and_rows, get_terminal_size
 import sys
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell import cache
+from rtcshell import deadline
+from rtcshell.lazy import create_rtctree
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import cmd_path_to_full_path
 
 
-def get_node_long_lines(nodes, use_colour=True):
-    info_strings = []
-    state_width = 0
-    total_width = 0
-    in_width = 0
-    out_width = 0
-    svc_width = 0
-    for node in nodes:
-        if node.is_directory:
-            if state_width == 0:
-                state_width = 1
-            if total_width == 0:
-                total_width = 1
-            if in_width == 0:
-                in_width = 1
-            if out_width == 0:
-                out_width = 1
-            if svc_width == 0:
-                svc_width = 1
-            name = build_attr_string(['bold', 'blue'],
+def get_port_count_string(ports, connected, use_colour=True):
+    plain = '{0}/{1}'.format(len(ports), len(connected))
+    coloured = build_attr_string('bold', supported=use_colour) + \
+               str(len(ports)) + \
+               build_attr_string('reset', supported=use_colour) + '/' + \
+               str(len(connected))
+    return (coloured, len(coloured) - len(plain))
+
+
+def get_component_node(entry):
+    '''Make a component node from a naming entry.
+
+    Only the component itself is contacted; no tree is created.
+
+    '''
+    from rtctree.component import Component
+    import RTC
+    return Component(entry.name, None, entry.object._narrow(RTC.RTObject))
+
+
+def get_node_summary(node, use_colour=True):
+    '''Fetch the information shown in a long listing for a single node.
+
+    The result is a tuple of six entries: state, total ports, input ports,
+    output ports, service ports and name. The first five are pairs of
+    (string, number of invisible colour characters in the string).
+    Components that cannot be reached before the deadline are shown as
+    unreachable, with their name in red.
+
+    '''
+    if node.is_directory or node.is_manager:
+        # Managers are directories in an RTC tree, but not in the naming
+        # entries used when the tree is not built
+        name = build_attr_string(['bold', 'blue'],
+                    supported=use_colour) + \
+                node.name + build_attr_string(['reset'],
+                    supported=use_colour)
+        return (('-', 0), ('-', 0), ('-', 0), ('-', 0), ('-', 0), name)
+    elif node.is_manager:
+        # Managers are not handled yet
+        name = build_attr_string(['bold', 'green'],
+                    supported=use_colour) + \
+                node.name + build_attr_string(['reset'],
+                    supported=use_colour)
+        return (('-', 0), ('-', 0), ('-', 0), ('-', 0), ('-', 0), name)
+    elif node.is_component:
+        try:
+            if not hasattr(node, 'get_state_string'):
+                # A naming entry rather than a node of a tree
+                node = get_component_node(node)
+            state_string = node.get_state_string(add_colour=use_colour)
+            state_string = (state_string,
+                    len(state_string) - len(node.plain_state_string))
+            total_string = get_port_count_string(node.ports,
+                    node.connected_ports, use_colour)
+            in_string = get_port_count_string(node.inports,
+                    node.connected_inports, use_colour)
+            out_string = get_port_count_string(node.outports,
+                    node.connected_outports, use_colour)
+            svc_string = get_port_count_string(node.svcports,
+                    node.connected_svcports, use_colour)
+        except deadline.unreachable_errors():
+            name = build_attr_string(['bold', 'red'],
                         supported=use_colour) + \
                     node.name + build_attr_string(['reset'],
                         supported=use_colour)
-            info_strings.append((('-', 0), ('-', 0), ('-', 0),
-                                 ('-', 0), ('-', 0), name))
-        elif node.is_manager:
-            # Managers are not handled yet
-            if state_width == 0:
-                state_width = 1
-            if total_width == 0:
-                total_width = 1
-            if in_width == 0:
-                in_width = 1
-            if out_width == 0:
-                out_width = 1
-            if svc_width == 0:
-                svc_width = 1
-            name = build_attr_string(['bold', 'green'],
-                        supported=use_colour) + \
-                    node.name + build_attr_string(['reset'],
-                        supported=use_colour)
-            info_strings.append((('-', 0), ('-', 0), ('-', 0),
-                                 ('-', 0), ('-', 0), name))
-        elif node.is_component:
-            state = node.state
-            state_string = node.plain_state_string
-            if len(state_string) > state_width:
-                state_width = len(state_string)
-            state_string = (node.get_state_string(add_colour=use_colour),
-                    len(node.get_state_string(add_colour=use_colour)) - \
-                            len(state_string))
-
-            num_ports = len(node.ports)
-            num_connected = len(node.connected_ports)
-            total_string = '{0}/{1}'.format(num_ports, num_connected)
-            if len(total_string) > total_width:
-                total_width = len(total_string)
-            coloured_string = build_attr_string('bold',
-                                supported=use_colour) + \
-                              str(num_ports) + \
-                              build_attr_string('reset',
-                                supported=use_colour) + '/' + \
-                              str(num_connected)
-            total_string = (coloured_string, len(coloured_string) - \
-                                len(total_string))
-
-            num_ports = len(node.inports)
-            num_connected = len(node.connected_inports)
-            in_string = '{0}/{1}'.format(num_ports, num_connected)
-            if len(in_string) > in_width:
-                in_width = len(in_string)
-            coloured_string = build_attr_string('bold',
-                                supported=use_colour) + \
-                              str(num_ports) + \
-                              build_attr_string('reset',
-                                supported=use_colour) + '/' + \
-                              str(num_connected)
-            in_string = (coloured_string, len(coloured_string) - \
-                                len(in_string))
-
-            num_ports = len(node.outports)
-            num_connected = len(node.connected_outports)
-            out_string = '{0}/{1}'.format(num_ports, num_connected)
-            if len(out_string) > out_width:
-                out_width = len(out_string)
-            coloured_string = build_attr_string('bold',
-                                supported=use_colour) + \
-                              str(num_ports) + \
-                              build_attr_string('reset',
-                                supported=use_colour) + '/' + \
-                              str(num_connected)
-            out_string = (coloured_string, len(coloured_string) - \
-                                len(out_string))
-
-            num_ports = len(node.svcports)
-            num_connected = len(node.connected_svcports)
-            svc_string = '{0}/{1}'.format(num_ports, num_connected)
-            if len(svc_string) > svc_width:
-                svc_width = len(svc_string)
-            coloured_string = build_attr_string('bold',
-                                supported=use_colour) + \
-                              str(num_ports) + \
-                              build_attr_string('reset',
-                                supported=use_colour) + '/' + \
-                              str(num_connected)
-            svc_string = (coloured_string, len(coloured_string) - \
-                                len(svc_string))
-
-            info_strings.append((state_string, total_string, in_string,
-                                 out_string, svc_string, node.name))
-        else:
-            # Other types are unknowns
-            if state_width == 0:
-                state_width = 1
-            if total_width == 0:
-                total_width = 1
-            if in_width == 0:
-                in_width = 1
-            if out_width == 0:
-                out_width = 1
-            if svc_width == 0:
-                svc_width = 1
-            name = build_attr_string(['faint', 'white'],
-                        supported=use_colour) + \
-                    node.name + build_attr_string(['reset'],
-                        supported=use_colour)
-            info_strings.append((('-', 0), ('-', 0), ('-', 0),
-                                 ('-', 0), ('-', 0), name))
-    state_width += 2
-    total_width += 2
-    in_width += 2
-    out_width += 2
-    svc_width += 2
+            return (('Unreachable', 0), ('-', 0), ('-', 0), ('-', 0),
+                    ('-', 0), name)
+        return (state_string, total_string, in_string, out_string,
+                svc_string, node.name)
+    else:
+        # Other types are unknowns
+        name = build_attr_string(['faint', 'white'],
+                    supported=use_colour) + \
+                node.name + build_attr_string(['reset'],
+                    supported=use_colour)
+        return (('-', 0), ('-', 0), ('-', 0), ('-', 0), ('-', 0), name)
+
+
+def get_node_long_lines(nodes, use_colour=True, jobs=DEFAULT_JOBS):
+    # Fetch every node's information first, concurrently, as each component
+    # requires several remote calls. The formatting is done afterwards, in
+    # the original order of the nodes.
+    info_strings = parallel_map(lambda n: get_node_summary(n, use_colour),
+                                nodes, jobs)
+    widths = [1, 1, 1, 1, 1]
+    for string in info_strings:
+        for ii in range(5):
+            widths[ii] = max(widths[ii], len(string[ii][0]) - string[ii][1])
+    widths = [w + 2 for w in widths]
 
     result = []
     for string in info_strings:
         result.append('{0}{1}{2}{3}{4}{5}'.format(
-                string[0][0].ljust(state_width + string[0][1]),
-                string[1][0].ljust(total_width + string[1][1]),
-                string[2][0].ljust(in_width + string[2][1]),
-                string[3][0].ljust(out_width + string[3][1]),
-                string[4][0].ljust(svc_width + string[4][1]),
+                string[0][0].ljust(widths[0] + string[0][1]),
+                string[1][0].ljust(widths[1] + string[1][1]),
+                string[2][0].ljust(widths[2] + string[2][1]),
+                string[3][0].ljust(widths[3] + string[3][1]),
+                string[4][0].ljust(widths[4] + string[4][1]),
                 string[5]))
     return result
 
@@ -200,16 +158,18 @@ def format_items_list(items):
     return lines
 
 
-def list_directory(dir_node, long=False):
-    listing = dir_node.children
+def list_directory(dir_node, long=False, jobs=DEFAULT_JOBS, listing=None):
+    if listing is None:
+        listing = dir_node.children
     use_colour = colour_supported(sys.stdout)
     if long:
-        lines = get_node_long_lines(listing, use_colour=use_colour)
+        lines = get_node_long_lines(listing, use_colour=use_colour,
+                                    jobs=jobs)
         return lines
     else:
         items = []
         for entry in listing:
-            if entry.is_directory:
+            if entry.is_directory or entry.is_manager:
                 items.append((build_attr_string(['bold', 'blue'],
                                 supported=use_colour) + \
                               entry.name + '/' + \
@@ -235,6 +195,39 @@ def list_directory(dir_node, long=False):
         return format_items_list(items)
 
 
+def iterate_directories(root, rel_path='', jobs=DEFAULT_JOBS, listing=None):
+    '''Generator that walks the directories below root, depth first.
+
+    Yields a (relative path, node, children) tuple for root and each directory
+    below it. The relative path of root itself is an empty string. Each
+    directory is listed only when the walk reaches it. If root is a naming
+    entry rather than a node of a tree, only the listings on the current
+    branch are held, so memory use depends on the depth of the tree rather
+    than its size, and each directory can be printed as soon as it has been
+    listed.
+
+    The children of the directories in each directory are fetched
+    concurrently, so a directory that is slow to answer does not hold up its
+    siblings. Directories that cannot be reached are listed as empty.
+    Managers are directories holding their components, as in an RTC tree.
+
+    '''
+    from rtcshell.naming import get_children
+    if listing is None:
+        listing = get_children(root)
+    yield rel_path, root, listing
+    dirs = [c for c in listing if c.is_directory or c.is_manager]
+    listings = parallel_map(get_children, dirs, jobs)
+    for child, child_listing in zip(dirs, listings):
+        if rel_path:
+            child_path = rel_path + '/' + child.name
+        else:
+            child_path = child.name
+        for result in iterate_directories(child, child_path, jobs,
+                                          child_listing):
+            yield result
+
+
 def list_target(cmd_path, full_path, options, tree=None):
     path, port = parse_path(full_path)
     if port:
@@ -249,56 +242,68 @@ object.'.format(sys.argv[0], cmd_path)
         trailing_slash = True
         path = path[:-1]
 
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        return 1
+    if not tree and ((not options.long and cache.enabled() and \
+            len(path) > 1) or deadline.get_timeout() or options.recurse):
+        # A short listing only needs the names and types of the objects,
+        # which the snapshot cache holds, so no tree is needed. With a
+        # deadline, the name servers are also walked directly, so that each
+        # component is only contacted by the long listing, concurrently, and
+        # one that cannot be reached does not stop the tree being built. A
+        # recursive listing walks the name servers directly so that each
+        # directory is printed as soon as it is listed, rather than after
+        # the whole tree has been built.
+        from rtcshell import naming
+        if len(path) > 1:
+            node = naming.get_entry(path)
+        else:
+            node = naming.RootEntry(path)
+    else:
+        if not tree:
+            tree = create_rtctree(paths=path)
+        if not tree:
+            return 1
+        node = None
+        if tree.has_path(path):
+            node = tree.get_node(path)
 
-    if not tree.has_path(path):
+    if not node:
         print >>sys.stderr, '{0}: Cannot access {1}: No such directory or \
 object.'.format(sys.argv[0], cmd_path)
         return 1
-    if tree.is_component(path):
+    if node.is_component:
         # Path points to a single component: print it like 'ls <file>'.
         if trailing_slash:
             # If there was a trailing slash, complain that a component is not a
             # directory.
             print >>sys.stderr, '{0}: cannot access {1}: Not a \
-directory.'.format(sys.argv[0], address)
+directory.'.format(sys.argv[0], cmd_path)
             return 1
         if options.long:
-            lines = get_node_long_lines([tree.get_node(path)],
-                                        sys.stdout.isatty())
+            lines = get_node_long_lines([node], sys.stdout.isatty())
             for l in lines:
                 print l
         else:
             print path[-1]
-    elif tree.is_directory(path):
+    elif node.is_directory or node.is_manager:
         # If recursing, need to list this directory and all its children
         if options.recurse:
-            recurse_root = tree.get_node(path)
-            recurse_root_path = recurse_root.full_path
-            def get_name(node, args):
-                if node.full_path.startswith(recurse_root_path):
-                    result = node.full_path[len(recurse_root_path):]
+            # Print each directory as soon as it has been listed, rather than
+            # gathering the entire tree's listings first.
+            for dir, dir_node, listing in iterate_directories(node,
+                    jobs=options.jobs):
+                if dir:
+                    print './' + dir + ':'
                 else:
-                    result = node.full_path
-                return result.lstrip('/')
-            dir_names = ['.'] + recurse_root.iterate(get_name,
-                    args=options.long, filter=['is_directory'])[1:]
-            listings = recurse_root.iterate(list_directory,
-                    args=options.long, filter=['is_directory'])
-            for dir, listing in zip(dir_names, listings):
-                if dir == '.':
                     print '.:'
-                else:
-                    print './' + dir + ':'
-                for l in listing:
+                for l in list_directory(dir_node, options.long,
+                                        options.jobs, listing):
                     print l
                 print
+                sys.stdout.flush()
         else:
-            dir_node = tree.get_node(path)
-            lines = list_directory(dir_node, options.long)
+            from rtcshell.naming import get_children
+            lines = list_directory(node, options.long, options.jobs,
+                                   get_children(node))
             for l in lines:
                 print l
     else:
@@ -333,6 +338,14 @@ Name
 [Default: %default]')
     parser.add_option('-R', '--recurse', dest='recurse', action='store_true',
             default=False, help='List recursively. [Default: %default]')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of components to query at \
+once. [Default: %default]')
+    parser.add_option('--timeout', dest='timeout', action='store',
+            type='float', default=None, help='Number of seconds to wait for \
+each call to an object. Components that do not answer in time are shown as \
+unreachable in a long listing. [Default: the value of {0}, or no \
+limit]'.format(deadline.ENV_VAR))
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -341,6 +354,7 @@ Name
     except OptionError, e:
         print 'OptionError:', e
         return 1
+    deadline.set_timeout(options.timeout)
 
     if not args:
         cmd_path = ''
@@ -29,23 +29,29 @@ from rtctree.exceptions import RtcTreeError, FailedToLoadModuleError, \
                                FailedToUnloadModuleError, \
                                FailedToCreateComponentError, \
                                FailedToDeleteComponentError
-from rtctree.tree import create_rtctree, InvalidServiceError, \
-                         FailedToNarrowRootNamingError, \
-                         NonRootPathError
 from rtctree.path import parse_path
+import shlex
 import sys
+import time
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell import cache
+from rtcshell.lazy import create_rtctree
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import cmd_path_to_full_path
 
 
+# The number of arguments each manifest command takes
+MANIFEST_COMMANDS = {'load': 2, 'unload': 1, 'create': 1, 'delete': 1}
+
+
 def get_manager(cmd_path, full_path, tree=None):
     path, port = parse_path(full_path)
     if port:
         # Can't configure a port
         print >>sys.stderr, '{0}: Cannot access {1}: No such \
 object.'.format(sys.argv[0], cmd_path)
-        return None
+        return tree, None
 
     if not path[-1]:
         # There was a trailing slash - ignore it
@@ -54,7 +60,7 @@ object.'.format(sys.argv[0], cmd_path)
     if not tree:
         tree = create_rtctree(paths=path)
     if not tree:
-        return None
+        return None, None
 
     object = tree.get_node(path)
     if not object:
@@ -110,6 +116,9 @@ def create_component(cmd_path, full_path, module_name, tree=None):
 {1}'.format(sys.argv[0], module_name)
         return 1
 
+    # Components register themselves with the name server, so none of its
+    # cached listings can be trusted any more
+    cache.invalidate_server(cache.server_of(full_path))
     return 0
 
 
@@ -125,11 +134,166 @@ def delete_component(cmd_path, full_path, instance_name, tree=None):
                 sys.argv[0], instance_name)
         return 1
 
+    # The components registered with the name server have changed
+    cache.invalidate_server(cache.server_of(full_path))
+    return 0
+
+
+def read_manifest(filename):
+    '''Read a manifest of manager commands.
+
+    Each line holds one of the load, unload, create or delete commands and its
+    arguments, quoted as in a shell. Blank lines and comments starting with #
+    are ignored. Returns a list of (line number, command, arguments) entries
+    and a list of errors.
+
+    '''
+    if filename == '-':
+        lines = sys.stdin.readlines()
+    else:
+        f = open(filename, 'r')
+        try:
+            lines = f.readlines()
+        finally:
+            f.close()
+
+    entries = []
+    errors = []
+    for ii, line in enumerate(lines):
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError, e:
+            errors.append('{0}:{1}: {2}'.format(filename, ii + 1, e))
+            continue
+        if not words:
+            continue
+        if words[0] not in MANIFEST_COMMANDS:
+            errors.append('{0}:{1}: Unknown command: {2}'.format(filename,
+                    ii + 1, words[0]))
+        elif len(words) - 1 != MANIFEST_COMMANDS[words[0]]:
+            errors.append('{0}:{1}: Incorrect number of arguments for {2} \
+command.'.format(filename, ii + 1, words[0]))
+        else:
+            entries.append((ii + 1, words[0], words[1:]))
+    return entries, errors
+
+
+def run_manifest(cmd_path, full_path, filename, options, tree=None):
+    '''Carry out the commands in a manifest on a manager.
+
+    The manager is found once. Components are deleted and modules unloaded
+    first, then modules are loaded, each module only once, and finally the
+    components are created. Components are created and deleted concurrently
+    by calling the manager directly, so requests are queued in the manager
+    even if it handles them one at a time. The time taken to create each
+    component is printed.
+
+    '''
+    try:
+        entries, errors = read_manifest(filename)
+    except IOError, e:
+        print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
+        return 1
+    if errors:
+        for e in errors:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
+        return 1
+
+    tree, mgr = get_manager(cmd_path, full_path, tree)
+    if not mgr:
+        return 1
+
+    from omniORB import CORBA
+    import RTC
+    def timed(func, arg):
+        start = time.time()
+        try:
+            ok = func(arg)
+        except CORBA.Exception, e:
+            return time.time() - start, str(e) or e.__class__.__name__
+        if not ok:
+            return time.time() - start, 'Failed'
+        return time.time() - start, None
+    def create(module_name):
+        return not CORBA.is_nil(mgr.object.create_component(module_name))
+    def delete(instance_name):
+        return mgr.object.delete_component(instance_name) == RTC.RTC_OK
+
+    failed = 0
+    changed = False
+    try:
+        deletes = [args[0] for l, c, args in entries if c == 'delete']
+        results = parallel_map(lambda n: timed(delete, n), deletes,
+                               options.jobs)
+        changed = changed or deletes != []
+        for name, (t, error) in zip(deletes, results):
+            if error:
+                print >>sys.stderr, '{0}: Failed to delete component {1}: \
+{2}'.format(sys.argv[0], name, error)
+                failed += 1
+            else:
+                print 'Deleted {0} in {1:.3f} s'.format(name, t)
+
+        # All the unloads are done before any load
+        for command in ['unload', 'load']:
+            done = set()
+            for line, c, args in entries:
+                if c != command or args[0] in done:
+                    continue
+                done.add(args[0])
+                start = time.time()
+                try:
+                    if command == 'unload':
+                        mgr.unload_module(args[0])
+                        print 'Unloaded {0} in {1:.3f} s'.format(args[0],
+                                time.time() - start)
+                    else:
+                        mgr.load_module(args[0], args[1])
+                        print 'Loaded {0} in {1:.3f} s'.format(args[0],
+                                time.time() - start)
+                except FailedToUnloadModuleError:
+                    print >>sys.stderr, '{0}: Failed to unload module \
+{1}'.format(sys.argv[0], args[0])
+                    failed += 1
+                except FailedToLoadModuleError:
+                    print >>sys.stderr, '{0}: Failed to load module \
+{1}'.format(sys.argv[0], args[0])
+                    failed += 1
+
+        creates = [args[0] for l, c, args in entries if c == 'create']
+        start = time.time()
+        results = parallel_map(lambda n: timed(create, n), creates,
+                               options.jobs)
+        changed = changed or creates != []
+        times = []
+        for name, (t, error) in zip(creates, results):
+            if error:
+                print >>sys.stderr, '{0}: Failed to create component from \
+module {1}: {2}'.format(sys.argv[0], name, error)
+                failed += 1
+            else:
+                print 'Created {0} in {1:.3f} s'.format(name, t)
+                times.append(t)
+        if creates:
+            summary = '{0} of {1} components created in {2:.3f} s'.format(
+                    len(times), len(creates), time.time() - start)
+            if times:
+                summary += ' (latency: mean {0:.3f} s, max {1:.3f} \
+s)'.format(sum(times) / len(times), max(times))
+            print summary
+    finally:
+        if changed:
+            # The components registered with the name server have changed
+            cache.invalidate_server(cache.server_of(full_path))
+
+    if failed:
+        return 1
     return 0
 
 
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <path> <command> [args]
+       %prog [options] <path> -f <manifest>
 Control a manager, adding and removing shared libraries and components. To
 set a mananger's configuration, use rtconf.
 
@@ -152,12 +316,26 @@ instance name of a new component of type ConsoleIn, use:
 delete <instance name>
 Delete a component instance from the manager, destroying it.
 
+A manifest holds many of these commands, one per line, quoted as in a shell.
+Blank lines and lines starting with # are ignored. The manager is only found
+once. Components are deleted and modules unloaded first, then modules are
+loaded, each only once, and finally components are created. Components are
+created and deleted concurrently; use --jobs=1 if the manager cannot handle
+this. The time taken to create each component is printed. Use - to read the
+manifest from standard input.
+
 ''' + RTSH_PATH_USAGE
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
     parser.add_option('-d', '--debug', dest='debug', action='store_true',
             default=False, help='Print debugging information. \
 [Default: %default]')
+    parser.add_option('-f', '--file', dest='manifest', action='store',
+            type='string', default=None, help='Carry out the commands in a \
+manifest file.')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of components to create or \
+delete at once. [Default: %default]')
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -167,7 +345,13 @@ Delete a component instance from the manager, destroying it.
         print 'OptionError:', e
         return 1
 
-    if len(args) > 2:
+    if options.manifest:
+        if len(args) != 1:
+            print >>sys.stderr, usage
+            return 1
+        return run_manifest(args[0], cmd_path_to_full_path(args[0]),
+                            options.manifest, options, tree)
+    elif len(args) > 2:
         cmd_path = args[0]
         cmd = args[1]
         args = args[2:]
@@ -23,24 +23,24 @@ Implementation of the command to print data sent by a port to the console.
 # $Source$
 
 
-import inspect
-import OpenRTM_aist
 from optparse import OptionParser, OptionError
 import os
 import re
-import RTC
 from rtctree.exceptions import RtcTreeError, FailedToConnectError, \
                                IncompatibleDataPortConnectionPropsError, \
                                WrongPortTypeError, \
                                MismatchedInterfacesError, \
                                MismatchedPolarityError
-from rtctree.tree import create_rtctree
 from rtctree.path import parse_path
 import sys
 from traceback import print_exception
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell import deadline
+from rtcshell.lazy import create_rtctree
+from rtcshell.parallel import DEFAULT_JOBS
 from rtcshell.path import cmd_path_to_full_path
+from rtcshell.presets import check_port, get_preset
 
 
 index = 0
@@ -123,19 +123,21 @@ port'.format(sys.argv[0], cmd_path)
     return 0, port_obj.properties['dataport.data_type']
 
 
-def select_index(path, tree=None):
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        return 1, 0
-
+def select_index(path, tree=None, jobs=DEFAULT_JOBS):
     listener_re = re.compile('{0}(\d+)0.rtc'.format(listener_name_base()))
-    def get_result(node, args):
-        return int(listener_re.match(node.name).group(1))
-    def is_listener(node):
-        if listener_re.match(node.name):
-            return True
-    matches = tree.iterate(get_result, filter=['is_component', is_listener])
+    if tree:
+        names = tree.iterate(lambda n, args: n.name, filter=['is_component'])
+    else:
+        # Only the names of the components are needed, so the name servers
+        # are walked directly rather than building a tree, and no component
+        # or manager is contacted. Objects that cannot be reached are skipped.
+        from rtcshell import naming
+        names = []
+        for ns in naming.get_root_entries(path):
+            entries = naming.walk(ns, descend_managers=False, jobs=jobs)
+            names += [e.name for e in entries if e.is_component]
+    matches = [int(m.group(1)) for m in [listener_re.match(n) for n in names] \
+               if m]
     if not matches:
         # No existing listeners, so claim the first spot
         return 0, 0
@@ -144,6 +146,8 @@ def select_index(path, tree=None):
 
 
 def find_port_type(type_name):
+    import inspect
+    import RTC
     types = [member for member in inspect.getmembers (RTC, inspect.isclass) \
                 if member[0] == type_name]
     if len(types) == 0:
@@ -179,37 +183,53 @@ def listener_spec(index):
             '']
 
 
-class Listener(OpenRTM_aist.DataFlowComponentBase):
-    def __init__(self, manager):
-        OpenRTM_aist.DataFlowComponentBase.__init__ (self, manager)
-        self._port_type = port_type
+def make_listener_class():
+    '''Create the listener component class.
+
+    The class is created when it is needed rather than when this module is
+    imported, as OpenRTM-aist is slow to import and most uses of this command
+    (help, bad arguments, missing ports) never need it.
+
+    '''
+    import OpenRTM_aist
+    import RTC
+
+    class Listener(OpenRTM_aist.DataFlowComponentBase):
+        def __init__(self, manager):
+            OpenRTM_aist.DataFlowComponentBase.__init__ (self, manager)
+            self._port_type = port_type
+
+        def onStartup(self, ec_id):
+            try:
+                self.inport_data = self._port_type(RTC.Time(0, 0), None)
+                self.inport = OpenRTM_aist.InPort('input', self.inport_data,
+                        OpenRTM_aist.RingBuffer (8))
+                self.registerInPort('input', self.inport)
+            except:
+                print_exception(*sys.exc_info ())
+                return RTC.RTC_ERROR
+            return RTC.RTC_OK
 
-    def onStartup(self, ec_id):
-        try:
-            self.inport_data = self._port_type(RTC.Time(0, 0), None)
-            self.inport = OpenRTM_aist.InPort('input', self.inport_data,
-                    OpenRTM_aist.RingBuffer (8))
-            self.registerInPort('input', self.inport)
-        except:
-            print_exception(*sys.exc_info ())
-            return RTC.RTC_ERROR
-        return RTC.RTC_OK
 
+        def onExecute(self, ec_id):
+            try:
+                if self.inport.isNew():
+                    self.inport_data = self.inport.read()
+                    print '[{0}.{1:09}] {2}'.format(self.inport_data.tm.sec,
+                            self.inport_data.tm.nsec,
+                            str(self.inport_data.data))
+            except:
+                print_exception(*sys.exc_info ())
+            return RTC.RTC_OK
 
-    def onExecute(self, ec_id):
-        try:
-            if self.inport.isNew():
-                self.inport_data = self.inport.read()
-                print '[{0}.{1:09}] {2}'.format(self.inport_data.tm.sec,
-                        self.inport_data.tm.nsec, str(self.inport_data.data))
-        except:
-            print_exception(*sys.exc_info ())
-        return RTC.RTC_OK
+    return Listener
 
 
 def ListenerInit(manager):
+    import OpenRTM_aist
     profile = OpenRTM_aist.Properties(defaults_str=listener_spec(index))
-    manager.registerFactory(profile, Listener, OpenRTM_aist.Delete)
+    manager.registerFactory(profile, make_listener_class(),
+                            OpenRTM_aist.Delete)
     comp = manager.createComponent('{0}'.format(\
             listener_name(index)))
 
@@ -222,6 +242,7 @@ def create_listener_comp(port_string):
 {1}'.format(sys.argv[0], port_string)
         return 1, None
 
+    import OpenRTM_aist
     mgr = OpenRTM_aist.Manager.init(1, [sys.argv[0]])
     mgr.setModuleInitProc(ListenerInit)
     mgr.activateManager()
@@ -238,8 +259,13 @@ def connect_listener(cmd_path, path, port, options, orb):
     if result:
         return result
 
+    if options.preset:
+        error = check_port(options.properties, source_port, cmd_path)
+        if error:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
+            return 1
     try:
-        source_port.connect(dest_port)
+        source_port.connect(dest_port, props=options.properties)
     except IncompatibleDataPortConnectionPropsError:
         print >>sys.stderr, '{0}: An incompatible data port property or \
 property value was given.'.format(sys.argv[0])
@@ -314,12 +340,20 @@ Print the data being sent by an output port.
 
 ''' + RTSH_PATH_USAGE + '''
 A connection will be made to the port using the default connection settings
-compatible with the port.'''
+compatible with the port, or the settings of a preset. See the help for rtcon
+for the available presets.'''
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
     parser.add_option('-d', '--debug', dest='debug', action='store_true',
             default=False, help='Print debugging information. \
 [Default: %default]')
+    parser.add_option('--preset', dest='preset', action='store',
+            type='string', default=None, help='Name of a preset of \
+connection properties.')
+    parser.add_option('--timeout', dest='timeout', action='store',
+            type='float', default=None, help='Number of seconds to wait for \
+each call to an object. Objects that do not answer in time are skipped. \
+[Default: the value of {0}, or no limit]'.format(deadline.ENV_VAR))
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -328,6 +362,14 @@ compatible with the port.'''
     except OptionError, e:
         print 'OptionError:', e
         return 1
+    deadline.set_timeout(options.timeout)
+
+    options.properties = {}
+    if options.preset:
+        options.properties, error = get_preset(options.preset)
+        if error:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
+            return 1
 
     if len(args) != 1:
         print >>sys.stderr, usage
@@ -39,7 +39,8 @@ def reset_action(object, ec_index):
 
 
 def main(argv=None, tree=None):
-    return base_main('Reset a component.', reset_action, argv)
+    return base_main('Reset a component.', reset_action, argv, tree,
+                     'INACTIVE')
 
 
 # vim: tw=79
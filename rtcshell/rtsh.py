@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: rtsh.py
+
+Single entry point for all the commands.
+
+Only the module of the requested command is imported. In batch mode, many
+commands are read from files or standard input and run in one process against
+a shared RTC tree.
+
+'''
+
+# $Source$
+
+
+from optparse import OptionParser, OptionError
+import shlex
+import sys
+
+from rtcshell import RTSH_VERSION
+from rtcshell.daemon import forward
+from rtcshell.session import COMMANDS, Session
+
+
+# Commands that can be run by rtsh but not in a session, as they do not
+# return until interrupted.
+STANDALONE_COMMANDS = {'rtprint': 'rtcshell.rtprint'}
+
+
+def find_command(command):
+    '''Get the full name of a command, allowing the rt prefix to be left off.
+
+    Returns None if there is no such command.
+
+    '''
+    for c in [command, 'rt' + command]:
+        if c in COMMANDS or c in STANDALONE_COMMANDS:
+            return c
+    return None
+
+
+def import_command(command):
+    '''Import the module implementing a command.'''
+    if command in COMMANDS:
+        name = COMMANDS[command]
+    else:
+        name = STANDALONE_COMMANDS[command]
+    __import__(name)
+    return sys.modules[name]
+
+
+def run_command(command, argv, prog=None):
+    '''Run a single command, in the daemon if it is running.
+
+    prog is the program name the command uses in its messages; the command's
+    name is used by default.
+
+    '''
+    if command in COMMANDS:
+        result = forward(command, argv)
+        if result is not None:
+            return result
+    module = import_command(command)
+    sys.argv = [prog or command] + argv
+    return module.main(argv)
+
+
+def read_batch(files):
+    '''Generator that yields (source, line number, line) for batch input.'''
+    if not files:
+        files = ['-']
+    for f in files:
+        if f == '-':
+            input = sys.stdin
+            name = '<stdin>'
+        else:
+            input = open(f, 'r')
+            name = f
+        try:
+            line_num = 0
+            for line in input:
+                line_num += 1
+                yield name, line_num, line
+        finally:
+            if input is not sys.stdin:
+                input.close()
+
+
+def run_batch(files, options):
+    '''Run the commands in files (or standard input) in a single session.
+
+    Each line holds one command and its arguments, quoted as in a shell.
+    Blank lines and comments starting with # are ignored. Returns 0 if every
+    command succeeded.
+
+    '''
+    session = Session()
+    failed = False
+    try:
+        for name, line_num, line in read_batch(files):
+            try:
+                words = shlex.split(line, comments=True)
+            except ValueError, e:
+                print >>sys.stderr, '{0}: {1}:{2}: {3}'.format(sys.argv[0],
+                        name, line_num, e)
+                failed = True
+                continue
+            if not words:
+                continue
+            command = find_command(words[0])
+            if command not in COMMANDS:
+                print >>sys.stderr, '{0}: {1}:{2}: Cannot run {3} in batch \
+mode.'.format(sys.argv[0], name, line_num, words[0])
+                failed = True
+            elif session.run(command, words[1:]):
+                failed = True
+            if failed and options.stop_on_error:
+                break
+    except IOError, e:
+        print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
+        return 1
+    if failed:
+        return 1
+    return 0
+
+
+def main(argv=None):
+    commands = sorted(COMMANDS.keys() + STANDALONE_COMMANDS.keys())
+    usage = '''Usage: %prog [options] <command> [args]
+       %prog --batch [options] [file...]
+       %prog -i
+       %prog complete <objects|ports|params> [path]
+Run an rtcshell command.
+
+The command may be given with or without the "rt" prefix, e.g. "rtsh ls" is
+the same as "rtls". Use "%prog <command> --help" for help on a command.
+
+In batch mode, commands are read one per line from the given files, or from
+standard input if no files are given, and run in a single process sharing one
+RTC tree. The rt prefix may be left off in batch mode too. Lines are split as
+in a shell; blank lines and lines starting with # are ignored. The tree is
+rebuilt after commands that change objects.
+
+The interactive shell runs commands typed at a prompt against a single RTC
+tree. It has its own working directory, changed with the cd command, and
+completes paths and ports using the tab key. Components changed by a command
+are reparsed, as are the components shown by rtcat, rtconf and rtls -l; use
+the refresh command to see other changes made outside the shell.
+
+The complete command prints the names of objects, ports or configuration
+parameters for use by shell completion scripts. See "%prog complete" for
+details.
+
+Commands:
+''' + '\n'.join(['    ' + c for c in commands])
+    version = RTSH_VERSION
+    parser = OptionParser(usage=usage, version=version)
+    parser.disable_interspersed_args()
+    parser.add_option('-b', '--batch', dest='batch', action='store_true',
+            default=False, help='Read commands from files or standard input. \
+[Default: %default]')
+    parser.add_option('-i', '--interactive', dest='interactive',
+            action='store_true', default=False, help='Run an interactive \
+shell. [Default: %default]')
+    parser.add_option('-e', '--stop-on-error', dest='stop_on_error',
+            action='store_true', default=False, help='Stop running batch \
+commands when one fails. [Default: %default]')
+    parser.add_option('-d', '--debug', dest='debug', action='store_true',
+            default=False, help='Print debugging information. \
+[Default: %default]')
+
+    if argv:
+        sys.argv = [sys.argv[0]] + argv
+    try:
+        options, args = parser.parse_args()
+    except OptionError, e:
+        print 'OptionError:', e
+        return 1
+
+    if options.interactive:
+        from rtcshell.shell import run_shell
+        return run_shell()
+    if options.batch:
+        return run_batch(args, options)
+    if not args:
+        print >>sys.stderr, parser.get_usage()
+        return 1
+    if args[0] == 'complete':
+        from rtcshell import complete
+        return complete.main(args[1:])
+    command = find_command(args[0])
+    if not command:
+        print >>sys.stderr, '{0}: Unknown command: {1}'.format(sys.argv[0],
+                                                              args[0])
+        return 1
+    return run_command(command, args[1:])
+
+
+# vim: tw=79
+
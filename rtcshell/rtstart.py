@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: rtstart.py
+
+Implementation of the command to activate all the components in a subtree,
+in the order given by their data port connections.
+
+'''
+
+# $Source$
+
+
+from optparse import OptionParser, OptionError
+from rtctree.path import parse_path
+import sys
+import time
+
+from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell.lazy import create_rtctree
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
+from rtcshell.path import cmd_path_to_full_path
+from rtcshell.rtact import activate_action
+from rtcshell.state_control_base import change_state, wait_for_state
+
+
+def get_consumers(components):
+    '''Find the components each component sends data to.
+
+    Only connections from data output ports to other components in the list
+    are considered. Returns a dictionary mapping each component to the set of
+    its consumers.
+
+    '''
+    consumers = dict([(c, set()) for c in components])
+    for c in components:
+        for port in c.ports:
+            if port.porttype != 'DataOutPort':
+                continue
+            for conn in port.connections:
+                for name, p in conn.ports:
+                    # Ports whose owner is not in the tree are unknown
+                    if p and p.owner in consumers and p.owner is not c:
+                        consumers[c].add(p.owner)
+    return consumers
+
+
+def get_waves(components):
+    '''Sort components into waves that can be activated together.
+
+    Each component is placed in a later wave than all the components it sends
+    data to, so consumers are activated before their producers. This is
+    Kahn's algorithm, working back from the components that produce no data
+    for the others. Returns a list of waves and a list of the components
+    caught in a connection cycle, which cannot be ordered.
+
+    '''
+    consumers = get_consumers(components)
+    producers = dict([(c, set()) for c in components])
+    for c in components:
+        for d in consumers[c]:
+            producers[d].add(c)
+    remaining = dict([(c, len(consumers[c])) for c in components])
+    wave = [c for c in components if not remaining[c]]
+    waves = []
+    while wave:
+        waves.append(wave)
+        next_wave = []
+        for c in wave:
+            del remaining[c]
+            for p in producers[c]:
+                remaining[p] -= 1
+                if not remaining[p]:
+                    next_wave.append(p)
+        # Keep the order stable from run to run
+        wave = [c for c in components if c in next_wave]
+    return waves, [c for c in components if c in remaining]
+
+
+def activate_wave(wave, options, tree):
+    '''Activate the components in a wave concurrently.
+
+    Returns a list of result messages, one for each component, and True if
+    any component failed.
+
+    '''
+    start = time.time()
+    results = parallel_map(lambda c: change_state(activate_action,
+                c.full_path, parse_path(c.full_path)[0], options.ec_index,
+                tree), wave, options.jobs)
+    messages = ['OK'] * len(wave)
+    failed = False
+    for ii, (object, error) in enumerate(results):
+        if error:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
+            messages[ii] = 'Failed'
+            failed = True
+    if options.wait and not failed:
+        from rtctree.component import Component
+        times = wait_for_state(wave, Component.ACTIVE, options.ec_index,
+                               options.timeout, start, options.jobs)
+        for ii, t in enumerate(times):
+            if t is None:
+                print >>sys.stderr, '{0}: {1}: Not Active after {2} \
+seconds'.format(sys.argv[0], wave[ii].full_path, options.timeout)
+                messages[ii] = 'Timed out'
+                failed = True
+            else:
+                messages[ii] = 'Active after {0:.3f} s'.format(t)
+    return messages, failed
+
+
+def start_subtree(cmd_path, full_path, options, tree=None):
+    path, port = parse_path(full_path)
+    if port:
+        print >>sys.stderr, '{0}: Cannot access {1}: No such directory or \
+object.'.format(sys.argv[0], cmd_path)
+        return 1
+    if not path[-1]:
+        # There was a trailing slash
+        path = path[:-1]
+
+    if not tree:
+        tree = create_rtctree(paths=path)
+    if not tree:
+        return 1
+    if not tree.has_path(path):
+        print >>sys.stderr, '{0}: Cannot access {1}: No such directory or \
+object.'.format(sys.argv[0], cmd_path)
+        return 1
+
+    components = tree.get_node(path).iterate(lambda n, args: n,
+                                             filter=['is_component'])
+    waves, cycle = get_waves(components)
+    if cycle:
+        print >>sys.stderr, '{0}: Connections form a cycle; activating \
+last: {1}'.format(sys.argv[0], ' '.join([c.full_path for c in cycle]))
+        waves.append(cycle)
+
+    if options.dry_run:
+        for ii, wave in enumerate(waves):
+            print 'Wave {0}:'.format(ii + 1)
+            for c in wave:
+                print '  {0}'.format(c.full_path)
+        return 0
+
+    for ii, wave in enumerate(waves):
+        start = time.time()
+        messages, failed = activate_wave(wave, options, tree)
+        print 'Wave {0}: {1:.3f} s'.format(ii + 1, time.time() - start)
+        for c, message in zip(wave, messages):
+            print '  {0}: {1}'.format(c.full_path, message)
+        if failed:
+            # Producers must not start before their consumers
+            print >>sys.stderr, '{0}: Stopping after wave {1}'.format(
+                    sys.argv[0], ii + 1)
+            return 1
+    return 0
+
+
+def main(argv=None, tree=None):
+    usage = '''Usage: %prog [options] [path]
+Activate all the components below a path, consumers before producers.
+
+The components are ordered using the connections of their data ports. A
+component is only activated once all the components it sends data to have
+been activated. Components that do not depend on each other are activated
+together, concurrently, in a wave. The time taken by each wave is printed.
+If a component in a wave cannot be activated, the later waves are not
+started.
+
+''' + RTSH_PATH_USAGE
+    version = RTSH_VERSION
+    parser = OptionParser(usage=usage, version=version)
+    parser.add_option('-d', '--debug', dest='debug', action='store_true',
+            default=False, help='Print debugging information. \
+[Default: %default]')
+    parser.add_option('-e', '--exec_context', dest='ec_index', type='int',
+            action='store', default=0,
+            help='Index of the execution context to activate within. \
+[Default: %default]')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of components to activate at \
+once. [Default: %default]')
+    parser.add_option('-n', '--dry-run', dest='dry_run', action='store_true',
+            default=False, help='Print the waves without activating \
+anything. [Default: %default]')
+    parser.add_option('-t', '--timeout', dest='timeout', action='store',
+            type='float', default=10.0, help='Number of seconds to wait for \
+with --wait. [Default: %default]')
+    parser.add_option('-w', '--wait', dest='wait', action='store_true',
+            default=False, help='Wait for the components in each wave to \
+become active before starting the next wave. [Default: %default]')
+
+    if argv:
+        sys.argv = [sys.argv[0]] + argv
+    try:
+        options, args = parser.parse_args()
+    except OptionError, e:
+        print 'OptionError:', e
+        return 1
+
+    if not args:
+        cmd_path = ''
+    elif len(args) == 1:
+        cmd_path = args[0]
+    else:
+        print >>sys.stderr, usage
+        return 1
+    full_path = cmd_path_to_full_path(cmd_path)
+
+    return start_subtree(cmd_path, full_path, options, tree)
+
+
+# vim: tw=79
+
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: session.py
+
+Running many commands in one process against a shared RTC tree.
+
+'''
+
+# $Source$
+
+
+import os
+import re
+from rtctree.path import parse_path
+import sys
+import threading
+import time
+import traceback
+
+from rtcshell import deadline
+from rtcshell.lazy import create_rtctree
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
+from rtcshell.path import cmd_path_to_full_path
+
+
+# Commands that can be run in a session, and the modules implementing them.
+COMMANDS = {'rtact': 'rtcshell.rtact',
+            'rtcat': 'rtcshell.rtcat',
+            'rtcon': 'rtcshell.rtcon',
+            'rtconf': 'rtcshell.rtconf',
+            'rtdeact': 'rtcshell.rtdeact',
+            'rtdel': 'rtcshell.rtdel',
+            'rtdis': 'rtcshell.rtdis',
+            'rtfind': 'rtcshell.rtfind',
+            'rtinject': 'rtcshell.rtinject',
+            'rtls': 'rtcshell.rtls',
+            'rtmgr': 'rtcshell.rtmgr',
+            'rtreset': 'rtcshell.rtreset',
+            'rtstart': 'rtcshell.rtstart'}
+# Commands that change the objects in the tree. The tree is refreshed after
+# running one of these.
+MUTATING_COMMANDS = ['rtact', 'rtcon', 'rtdeact', 'rtdel', 'rtdis', 'rtmgr',
+                     'rtreset', 'rtstart']
+# Mutating commands that only change the components named in their
+# arguments. Those components are reparsed rather than rebuilding the tree.
+# The other mutating commands change names or affect components not named in
+# their arguments.
+REPARSE_COMMANDS = ['rtact', 'rtcon', 'rtconf', 'rtdeact', 'rtreset']
+# Commands that show the state, ports or configuration of the components
+# they name, or of the components in the directories they name. Another
+# program may have changed those since the tree was built, so they are
+# reparsed before running one of these.
+SHOW_COMMANDS = ['rtcat', 'rtconf', 'rtls']
+# Options that take a value, for each command. Their values are not paths.
+STATE_VALUE_OPTIONS = ['-e', '--exec_context', '-j', '--jobs', '-t',
+                       '--timeout']
+VALUE_OPTIONS = {'rtact': STATE_VALUE_OPTIONS,
+                 'rtcon': ['-f', '--file', '-i', '--id', '-j', '--jobs',
+                           '-n', '--name', '-p', '--property', '--preset'],
+                 'rtconf': ['-f', '--file', '-j', '--jobs', '-o',
+                            '--output'],
+                 'rtdeact': STATE_VALUE_OPTIONS,
+                 'rtdel': ['-j', '--jobs', '-t', '--timeout'],
+                 'rtdis': ['-j', '--jobs'],
+                 'rtfind': ['-e', '--exec_context', '--exec', '-j', '--jobs',
+                            '--maxdepth', '--iname', '--name', '--type',
+                            '--timeout'],
+                 'rtls': ['-j', '--jobs', '--timeout'],
+                 'rtmgr': ['-f', '--file', '-j', '--jobs'],
+                 'rtreset': STATE_VALUE_OPTIONS,
+                 'rtstart': STATE_VALUE_OPTIONS}
+# Commands whose only path is their first argument. The other arguments are
+# sub-commands, parameters, values or file names.
+SINGLE_PATH_COMMANDS = ['rtconf', 'rtfind', 'rtinject', 'rtmgr']
+MAX_AGE_ENV_VAR = 'RTCSH_TREE_MAX_AGE'
+DEFAULT_MAX_AGE = 30
+HOST_RE = re.compile(r'^[\w.\-:]+$')
+
+
+def import_command(command):
+    '''Import the module implementing a command.
+
+    Only the requested module is imported. Returns None if the command is not
+    known.
+
+    '''
+    if command not in COMMANDS:
+        return None
+    __import__(COMMANDS[command])
+    return sys.modules[COMMANDS[command]]
+
+
+def has_file_option(argv):
+    '''Check if a command's arguments include the -f or --file option.'''
+    return [a for a in argv \
+            if a.startswith('-f') or a.startswith('--file')] != []
+
+
+def is_mutating(command, argv):
+    '''Check if running a command with the given arguments changes objects.'''
+    if command in MUTATING_COMMANDS:
+        return True
+    elif command == 'rtconf':
+        return 'set' in argv or 'act' in argv or 'apply' in argv or \
+                has_file_option(argv)
+    elif command == 'rtfind':
+        return [a for a in argv if a.startswith('--exec')] != []
+    return False
+
+
+def shows_components(command, argv):
+    '''Check if running a command shows details of components.
+
+    A short rtls listing only needs the names and types of objects, which
+    do not change while the tree is held.
+
+    '''
+    if command == 'rtls':
+        return [a for a in argv \
+                if a.startswith('-') and not a.startswith('--') and \
+                   'l' in a] != []
+    return command in SHOW_COMMANDS and not is_mutating(command, argv)
+
+
+def get_max_age():
+    try:
+        return float(os.environ.get(MAX_AGE_ENV_VAR, DEFAULT_MAX_AGE))
+    except ValueError:
+        return DEFAULT_MAX_AGE
+
+
+class Session(object):
+    '''Holds one RTC tree and runs commands against it.
+
+    The tree is only built when a command first needs it. Name servers
+    referred to by a command are added to the tree as they are needed. After
+    a command that changes objects is run, or once the tree is older than the
+    maximum age, the tree is rebuilt in the background so it is ready for the
+    next command. Commands that only change the components they name cause
+    just those components to be reparsed. Before a command that shows
+    details of components, the components it names are reparsed, so changes
+    made by other programs are seen.
+
+    '''
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._tree = None
+        self._built = 0
+        self._servers = []
+        self._bad_servers = []
+
+    def get_paths(self, command, argv):
+        '''Get the paths in a command's arguments, as path lists.
+
+        Options, the values of options and the arguments that the command
+        does not treat as paths are skipped.
+
+        '''
+        value_options = VALUE_OPTIONS.get(command, [])
+        args = []
+        skip = False
+        for arg in argv:
+            if skip:
+                skip = False
+            elif arg in value_options:
+                skip = True
+            elif not arg.startswith('-'):
+                args.append(arg)
+        if command in SINGLE_PATH_COMMANDS:
+            args = args[:1]
+        paths = []
+        for arg in args:
+            path, port = parse_path(cmd_path_to_full_path(arg))
+            if not path[-1]:
+                path = path[:-1]
+            paths.append(path)
+        return paths
+
+    def get_servers(self, command, argv):
+        '''Guess the name servers a command refers to from its arguments.'''
+        from rtcshell import naming
+        servers = naming.env_name_servers()
+        for path in self.get_paths(command, argv):
+            if len(path) > 1 and path[1] and HOST_RE.match(path[1]):
+                servers.append(path[1])
+        return servers
+
+    def get_tree(self, command=None, argv=[]):
+        '''Get the tree, making sure it holds the name servers in argv.'''
+        with self._lock:
+            if self._tree and time.time() - self._built > get_max_age():
+                self._tree = None
+            servers = [s for s in self.get_servers(command, argv) \
+                       if s not in self._servers and \
+                          s not in self._bad_servers]
+            if not self._tree:
+                self._servers = list(set(self._servers + servers))
+                self._build()
+            else:
+                self._add_servers(set(servers))
+            return self._tree
+
+    def _add_servers(self, servers):
+        '''Add name servers to the tree, remembering those that fail.'''
+        for s in servers:
+            try:
+                self._tree.add_name_server(s)
+                if s not in self._servers:
+                    self._servers.append(s)
+            except Exception:
+                if s in self._servers:
+                    self._servers.remove(s)
+                self._bad_servers.append(s)
+
+    def invalidate(self, background=True):
+        '''Discard the tree. It is rebuilt in the background by default.'''
+        with self._lock:
+            self._tree = None
+        if background:
+            t = threading.Thread(target=self.refresh)
+            t.setDaemon(True)
+            t.start()
+
+    def update(self, command, argv):
+        '''Bring the tree up to date after a command that changed objects.
+
+        If the command only changed the components named in its arguments,
+        those components are reparsed. Otherwise, the tree is rebuilt.
+
+        '''
+        with self._lock:
+            if command not in REPARSE_COMMANDS or not self._tree:
+                self.invalidate()
+                return
+            paths = self.get_paths(command, argv)
+            if not paths or has_file_option(argv) or '-' in argv or \
+                    [p for p in paths \
+                     if [e for e in p if '*' in e or '?' in e]]:
+                # The components changed are not known from the arguments
+                self.invalidate()
+                return
+            for path in paths:
+                node = None
+                if self._tree.has_path(path):
+                    node = self._tree.get_node(path)
+                if not node or not node.is_component or \
+                        not hasattr(node, 'reparse'):
+                    self.invalidate()
+                    return
+                node.reparse()
+
+    def reparse_shown(self, command, argv):
+        '''Reparse the components a command is about to show.
+
+        These are the components named in its arguments, or in the current
+        working directory if none are named, and the components directly
+        inside any directory named. Components that cannot be reached are
+        left for the command to report.
+
+        '''
+        with self._lock:
+            if not self._tree:
+                return
+            paths = self.get_paths(command, argv) or \
+                    self.get_paths(command, [''])
+            nodes = []
+            for path in paths:
+                if not self._tree.has_path(path):
+                    continue
+                node = self._tree.get_node(path)
+                if node.is_component:
+                    nodes.append(node)
+                elif node.is_directory:
+                    nodes += [c for c in node.children if c.is_component]
+            def reparse(node):
+                try:
+                    node.reparse()
+                except Exception:
+                    pass
+            parallel_map(reparse, [n for n in nodes \
+                                   if hasattr(n, 'reparse')], DEFAULT_JOBS)
+
+    def refresh(self):
+        with self._lock:
+            if not self._tree:
+                self._build()
+
+    def _build(self):
+        # The name servers in the environment are always in the tree. The
+        # others are added one at a time, so that one that cannot be reached
+        # is remembered and not tried again.
+        self._tree = create_rtctree()
+        if self._tree:
+            self._add_servers([s for s in self._servers \
+                               if not self._tree.has_path(['/', s])])
+        self._built = time.time()
+
+    def run(self, command, argv, stdout=None, stderr=None, env={},
+            cwd=None):
+        '''Run a command in this session.
+
+        The command's output is written to stdout and stderr, if given. Values
+        in env are placed in the environment while the command runs, and
+        restored afterwards; use this to pass the current working directory.
+        If cwd is given, the command is run in that directory, so relative
+        file names are found from it. Returns the command's result.
+
+        '''
+        module = import_command(command)
+        if not module:
+            print >>stderr or sys.stderr, '{0}: Unknown command: \
+{1}'.format(sys.argv[0], command)
+            return 1
+        with self._lock:
+            old_out, old_err, old_argv = sys.stdout, sys.stderr, sys.argv
+            old_env = dict([(k, os.environ.get(k)) for k in env])
+            old_cwd = os.getcwd()
+            try:
+                if cwd:
+                    try:
+                        os.chdir(cwd)
+                    except OSError, e:
+                        print >>stderr or sys.stderr, '{0}: Cannot change \
+to {1}: {2}'.format(command, cwd, e.strerror)
+                        return 1
+                for k in env:
+                    if env[k] is None:
+                        if k in os.environ:
+                            del os.environ[k]
+                    else:
+                        os.environ[k] = env[k]
+                # Use the deadline in the command's environment
+                deadline.set_timeout(None)
+                if stdout:
+                    sys.stdout = stdout
+                if stderr:
+                    sys.stderr = stderr
+                sys.argv = [command]
+                try:
+                    tree = self.get_tree(command, argv)
+                    if shows_components(command, argv):
+                        self.reparse_shown(command, argv)
+                    result = module.main(argv, tree=tree)
+                except SystemExit, e:
+                    result = e.code
+                except Exception:
+                    traceback.print_exc()
+                    result = 1
+                if is_mutating(command, argv):
+                    # Done while the environment is still in place, so
+                    # relative paths are found from the command's working
+                    # directory.
+                    self.update(command, argv)
+            finally:
+                sys.stdout, sys.stderr, sys.argv = old_out, old_err, old_argv
+                for k in old_env:
+                    if old_env[k] is None:
+                        if k in os.environ:
+                            del os.environ[k]
+                    else:
+                        os.environ[k] = old_env[k]
+                # A deadline set by the command must not apply to the next
+                deadline.set_timeout(None)
+                os.chdir(old_cwd)
+        if result is None:
+            result = 0
+        return result
+
+
+# vim: tw=79
+
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtcshell
+
+Copyright (C) 2009-2010
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+File: shell.py
+
+Interactive shell for running commands against a single RTC tree.
+
+The shell keeps its own working directory, which is passed to each command in
+place of the RTCSH_CWD environment variable, and completes paths and ports
+from the tree it holds.
+
+'''
+
+# $Source$
+
+
+import cmd
+import os
+import posixpath
+from rtctree.path import parse_path
+import shlex
+import sys
+
+from rtcshell.path import ENV_VAR
+from rtcshell.session import COMMANDS, Session
+
+
+def normalise_path(cwd, cmd_path):
+    '''Make a full path from a path given relative to cwd.
+
+    . and .. elements are resolved and any trailing slash is removed.
+
+    '''
+    if not cmd_path.startswith('/'):
+        cmd_path = posixpath.join(cwd, cmd_path)
+    result = posixpath.normpath(cmd_path)
+    if result.startswith('//'):
+        # normpath keeps a leading double slash
+        result = '/' + result.lstrip('/')
+    return result
+
+
+class Shell(cmd.Cmd):
+    '''Interactive shell holding a working directory and a session.'''
+    intro = 'rtcshell interactive shell. Type "help" for a list of commands.'
+
+    def __init__(self, session=None, cwd=None):
+        cmd.Cmd.__init__(self)
+        if not session:
+            session = Session()
+        self.session = session
+        if not cwd:
+            cwd = os.environ.get(ENV_VAR) or '/'
+        self.cwd = normalise_path('/', cwd)
+        self.last_result = 0
+        self.update_prompt()
+
+    def update_prompt(self):
+        self.prompt = 'rtsh:{0}> '.format(self.cwd)
+
+    def preloop(self):
+        try:
+            import readline
+            # Paths and ports are completed as a single word
+            readline.set_completer_delims(' \t\n')
+        except ImportError:
+            pass
+
+    def emptyline(self):
+        # Do not repeat the last command
+        pass
+
+    def get_node(self, cmd_path):
+        '''Get the node in the tree for a path, or None if there is none.'''
+        full_path = normalise_path(self.cwd, cmd_path)
+        path, port = parse_path(full_path)
+        tree = self.session.get_tree(argv=[full_path])
+        if not tree or not tree.has_path(path):
+            return None
+        return tree.get_node(path)
+
+    def default(self, line):
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError, e:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], e)
+            return
+        if not words:
+            return
+        command = words[0]
+        if command not in COMMANDS and 'rt' + command in COMMANDS:
+            command = 'rt' + command
+        if command not in COMMANDS:
+            print >>sys.stderr, '{0}: Unknown command: {1}'.format(
+                    sys.argv[0], words[0])
+            self.last_result = 1
+            return
+        self.last_result = self.session.run(command, words[1:],
+                                            env={ENV_VAR: self.cwd})
+
+    def do_cd(self, arg):
+        '''Change the working directory. With no path, go to the root.'''
+        words = shlex.split(arg)
+        if not words:
+            self.cwd = '/'
+            self.update_prompt()
+            return
+        full_path = normalise_path(self.cwd, words[0])
+        path, port = parse_path(full_path)
+        if port:
+            print >>sys.stderr, 'cd: {0}: Not a directory'.format(words[0])
+            return
+        if len(path) > 1:
+            node = self.get_node(full_path)
+            if not node:
+                print >>sys.stderr, 'cd: {0}: No such directory or \
+object'.format(words[0])
+                return
+            if not node.is_directory:
+                print >>sys.stderr, 'cd: {0}: Not a directory'.format(words[0])
+                return
+        self.cwd = full_path
+        self.update_prompt()
+
+    def do_pwd(self, arg):
+        '''Print the working directory.'''
+        print self.cwd
+
+    def do_refresh(self, arg):
+        '''Rebuild the tree, to see changes made from outside this shell.'''
+        self.session.invalidate(background=False)
+        self.session.refresh()
+
+    def do_exit(self, arg):
+        '''Leave the shell.'''
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        print
+        return True
+
+    def do_help(self, arg):
+        if arg and (arg in COMMANDS or 'rt' + arg in COMMANDS):
+            self.default(arg + ' --help')
+            return
+        cmd.Cmd.do_help(self, arg)
+        if not arg:
+            print 'rtcshell commands (the rt prefix is optional; use "help \
+<command>"):'
+            self.columnize(sorted(COMMANDS.keys()))
+            print
+
+    def completenames(self, text, *ignored):
+        names = cmd.Cmd.completenames(self, text, *ignored)
+        names += [c for c in COMMANDS if c.startswith(text)]
+        names += [c[2:] for c in COMMANDS if c[2:].startswith(text)]
+        return sorted(set(names))
+
+    def complete_path(self, text, dirs_only=False):
+        '''Complete a path or port from the contents of the tree.'''
+        if ':' in text:
+            comp_path, sep, port_text = text.rpartition(':')
+            node = self.get_node(comp_path)
+            if not node or not node.is_component or dirs_only:
+                return []
+            return [comp_path + ':' + p.name for p in node.ports \
+                    if p.name.startswith(port_text)]
+        dir_path, sep, name_text = text.rpartition('/')
+        prefix = dir_path + sep
+        node = self.get_node(prefix or '.')
+        if not node:
+            return []
+        results = []
+        for child in node.children:
+            if not child.name.startswith(name_text):
+                continue
+            if child.is_directory:
+                results.append(prefix + child.name + '/')
+            elif not dirs_only:
+                results.append(prefix + child.name)
+        return sorted(results)
+
+    def completedefault(self, text, line, begidx, endidx):
+        return self.complete_path(text)
+
+    def complete_cd(self, text, line, begidx, endidx):
+        return self.complete_path(text, dirs_only=True)
+
+
+def run_shell(cwd=None):
+    '''Run the interactive shell. Returns the result of the last command.'''
+    shell = Shell(cwd=cwd)
+    while True:
+        try:
+            shell.cmdloop()
+            break
+        except KeyboardInterrupt:
+            # Abandon the current line, as a shell does
+            print
+            shell.intro = None
+    return shell.last_result
+
+
+# vim: tw=79
+
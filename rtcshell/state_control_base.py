@@ -25,12 +25,95 @@ Base for the scripts that change component state.
 
 from optparse import OptionParser, OptionError
 import os
-from rtctree.tree import create_rtctree, BadECIndexError
 from rtctree.path import parse_path
 import sys
+import time
 
 from rtcshell import RTSH_PATH_USAGE, RTSH_VERSION
+from rtcshell.direct import get_node
+from rtcshell.lazy import create_rtctree, server_paths
+from rtcshell.parallel import DEFAULT_JOBS, parallel_map
 from rtcshell.path import cmd_path_to_full_path
+from rtcshell.pattern import expand_glob, is_glob
+
+
+# Limits on the time between checks of a component's state with --wait
+POLL_START = 0.01
+POLL_MAX = 0.5
+
+
+def read_paths(args):
+    '''Get the paths to work on, reading them from stdin in place of -.'''
+    result = []
+    for arg in args:
+        if arg == '-':
+            result += [l.strip() for l in sys.stdin if l.strip()]
+        else:
+            result.append(arg)
+    return result
+
+
+def change_state(action, cmd_path, path, ec_index, tree=None):
+    '''Carry out a state-changing action on the component at a path.
+
+    Returns a (node, error) tuple. The error is None if the action succeeded,
+    or a message describing why it failed.
+
+    '''
+    if not path[-1]:
+        # There was a trailing slash
+        return None, '{0}: Not an object'.format(cmd_path)
+
+    tree, object = get_node(path, tree, detached=True)
+    if not object:
+        return None, 'Cannot access {0}: No such object.'.format(cmd_path)
+    if not object.is_component:
+        return None, 'Cannot access {0}: Not an object'.format(cmd_path)
+
+    from omniORB import CORBA
+    from rtctree.tree import BadECIndexError
+    try:
+        action(object, ec_index)
+    except BadECIndexError, e:
+        return object, 'No execution context at index {0}'.format(e.args[0])
+    except CORBA.Exception, e:
+        return object, 'Cannot access {0}: {1}'.format(cmd_path, e)
+    return object, None
+
+
+def wait_for_state(nodes, state, ec_index, timeout, start, jobs=DEFAULT_JOBS):
+    '''Poll components until they are in a state in an execution context.
+
+    All the components still waiting are checked together, concurrently. The
+    time between checks starts at POLL_START seconds and doubles after each
+    check, up to POLL_MAX seconds. Returns a list holding, for each node, the
+    number of seconds since start at which the node was seen in the state, or
+    None if it was not seen in the state before the timeout.
+
+    '''
+    from omniORB import CORBA
+    def get_state(node):
+        try:
+            return node.refresh_state_in_ec(ec_index)
+        except CORBA.Exception:
+            # Try again next time
+            return None
+
+    times = [None] * len(nodes)
+    waiting = range(len(nodes))
+    delay = POLL_START
+    while waiting:
+        states = parallel_map(lambda ii: get_state(nodes[ii]), waiting, jobs)
+        elapsed = time.time() - start
+        for ii, s in zip(waiting, states):
+            if s == state:
+                times[ii] = elapsed
+        waiting = [ii for ii in waiting if times[ii] is None]
+        if not waiting or elapsed >= timeout:
+            break
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, POLL_MAX)
+    return times
 
 
 def alter_component_state(action, cmd_path, full_path, options, tree=None):
@@ -41,42 +124,108 @@ def alter_component_state(action, cmd_path, full_path, options, tree=None):
 object.'.format(sys.argv[0], cmd_path)
         return 1
 
-    trailing_slash = False
-    if not path[-1]:
-        # There was a trailing slash
-        print >>sys.stderr, '{0}: {1}: Not an \
-object'.format(sys.argv[0], cmd_path)
+    object, error = change_state(action, cmd_path, path, options.ec_index,
+                                 tree)
+    if error:
+        print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
         return 1
+    return 0
 
-    if not tree:
-        tree = create_rtctree(paths=path)
-    if not tree:
-        return 1
 
-    if not tree.has_path(path):
-        print >>sys.stderr, '{0}: Cannot access {1}: No such \
+def alter_components_state(action, cmd_paths, options, tree=None,
+                           wait_state=None):
+    '''Carry out an action on many components, using a single tree.
+
+    The paths may contain wildcards, which match only components. The
+    actions are carried out concurrently, and the result for each component
+    is printed once they have all finished. Errors are also printed to
+    stderr.
+
+    If options.wait is set, the components are then polled until they are in
+    wait_state (the name of a state in rtctree.component.Component), and the
+    time each took to get there is printed.
+
+    '''
+    targets = []
+    for cmd_path in cmd_paths:
+        path, port = parse_path(cmd_path_to_full_path(cmd_path))
+        if port:
+            print >>sys.stderr, '{0}: Cannot access {1}: No such \
 object.'.format(sys.argv[0], cmd_path)
-        return 1
-    object = tree.get_node(path)
-    if not object.is_component:
-        print >>sys.stderr, '{0}: Cannot access {1}: Not an \
-object'.format(sys.argv[0], cmd_path)
-        return 1
+            return 1
+        targets.append((cmd_path, path))
 
-    try:
-        action(object, options.ec_index)
-    except BadECIndexError, e:
-        print >>sys.stderr, '{0}: No execution context at index \
-{1}'.format(sys.argv[0], e.args[0])
-        return 1
+    if not tree and (len(targets) > 1 or is_glob(targets[0][0])):
+        # The tree only needs the name servers; these cannot be known for a
+        # wildcard in the name server's place.
+        tree_paths = server_paths([p for c, p in targets \
+                                   if not is_glob(''.join(p[1:2]))])
+        tree = create_rtctree(paths=tree_paths or ['/'])
+        if not tree:
+            return 1
+
+    work = []
+    for cmd_path, path in targets:
+        if not is_glob(cmd_path):
+            work.append((cmd_path, path))
+            continue
+        matches = expand_glob(tree, path, filter=['is_component'])
+        if not matches:
+            print >>sys.stderr, '{0}: Cannot access {1}: No such \
+object.'.format(sys.argv[0], cmd_path)
+            return 1
+        work += [(m, parse_path(m)[0]) for m in matches]
 
+    start = time.time()
+    results = parallel_map(lambda w: change_state(action, w[0], w[1],
+                                                  options.ec_index, tree),
+                           work, options.jobs)
+    messages = ['OK'] * len(work)
+    failed = False
+    for ii, (object, error) in enumerate(results):
+        if error:
+            print >>sys.stderr, '{0}: {1}'.format(sys.argv[0], error)
+            messages[ii] = 'Failed'
+            failed = True
+
+    if options.wait:
+        from rtctree.component import Component
+        state = getattr(Component, wait_state)
+        state_name = wait_state.capitalize()
+        waiting = [ii for ii, (o, e) in enumerate(results) if not e]
+        times = wait_for_state([results[ii][0] for ii in waiting], state,
+                               options.ec_index, options.timeout, start,
+                               options.jobs)
+        for ii, t in zip(waiting, times):
+            if t is None:
+                print >>sys.stderr, '{0}: {1}: Not {2} after {3} \
+seconds'.format(sys.argv[0], work[ii][0], state_name, options.timeout)
+                messages[ii] = 'Timed out'
+                failed = True
+            else:
+                messages[ii] = '{0} after {1:.3f} s'.format(state_name, t)
+
+    for (cmd_path, path), message in zip(work, messages):
+        print '{0}: {1}'.format(cmd_path, message)
+    if failed:
+        return 1
     return 0
 
 
-def base_main(description, action, argv=None, tree=None):
-    usage = '''Usage: %prog [options] <path>
+def base_main(description, action, argv=None, tree=None, wait_state=None):
+    usage = '''Usage: %prog [options] <path> [path...]
 {0}
 
+Multiple components can be given. The * and ? wildcards may be used in any
+part of a path to match the components at that level of the tree; quote them
+to stop the shell expanding them. A path of - reads paths from standard input,
+one per line. All the components are changed concurrently, and the result for
+each is printed.
+
+With --wait, the command does not finish until the components have reached
+the new state, or the timeout has passed. The time each component took to
+reach the state is printed.
+
 {1}'''.format(description, RTSH_PATH_USAGE)
     version = RTSH_VERSION
     parser = OptionParser(usage=usage, version=version)
@@ -87,6 +236,15 @@ def base_main(description, action, argv=None, tree=None):
             action='store', default=0,
             help='Index of the execution context to activate within. \
 [Default: %default]')
+    parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+            default=DEFAULT_JOBS, help='Number of components to change at \
+once. [Default: %default]')
+    parser.add_option('-t', '--timeout', dest='timeout', action='store',
+            type='float', default=10.0, help='Number of seconds to wait for \
+with --wait. [Default: %default]')
+    parser.add_option('-w', '--wait', dest='wait', action='store_true',
+            default=False, help='Wait for the components to reach the new \
+state. [Default: %default]')
 
     if argv:
         sys.argv = [sys.argv[0]] + argv
@@ -96,19 +254,19 @@ def base_main(description, action, argv=None, tree=None):
         print 'OptionError:', e
         return 1
 
-    if not args:
+    cmd_paths = read_paths(args)
+    if not cmd_paths:
         # If no path given then can't do anything.
         print >>sys.stderr, '{0}: No component specified.'.format(sys.argv[0])
         return 1
-    elif len(args) == 1:
-        cmd_path = args[0]
-    else:
-        print >>sys.stderr, usage
-        return 1
-    full_path = cmd_path_to_full_path(cmd_path)
-
-    return alter_component_state(action, cmd_path, full_path, options, tree)
+    elif len(cmd_paths) == 1 and not is_glob(cmd_paths[0]) and \
+            not options.wait:
+        cmd_path = cmd_paths[0]
+        full_path = cmd_path_to_full_path(cmd_path)
+        return alter_component_state(action, cmd_path, full_path, options,
+                                     tree)
+    return alter_components_state(action, cmd_paths, options, tree,
+                                  wait_state)
 
 
 # vim: tw=79
-
@@ -28,10 +28,11 @@ __version__ = '$Revision: $'
 
 import os
 from rtctree.exceptions import RtcTreeError
-from rtctree.tree import create_rtctree
 from rtctree.path import parse_path
 import sys
 
+from rtcshell import cache
+from rtcshell.lazy import create_rtctree
 from rtcshell.path import ENV_VAR, cmd_path_to_full_path
 
 
@@ -65,15 +66,26 @@ directory'.format(cmd_path)
         # Remove trailing slash part
         path = path[:-1]
 
-    tree = create_rtctree(paths=path)
-    if not tree:
-        return 1
-
-    if not tree.has_path(path):
+    if cache.enabled() and len(path) > 1:
+        # The snapshot cache knows which objects are directories, so there is
+        # no need to build a tree.
+        from rtcshell import naming
+        node = naming.get_entry(path)
+    else:
+        tree = create_rtctree(paths=path)
+        if not tree:
+            return 1
+        node = None
+        if tree.has_path(path):
+            node = tree.get_node(path)
+
+    if not node:
         print >>sys.stderr, 'rtcd: {0}: No such directory or \
 object'.format(cmd_path)
         return 1
-    if not tree.is_directory(path):
+    if not node.is_directory and not node.is_manager:
+        # Managers are directories in an RTC tree, but not in the naming
+        # entries found using the cache
         print >>sys.stderr, 'rtcd: {0}: Not a directory'.format(cmd_path)
         return 1
 
@@ -0,0 +1,13 @@
+@echo off
+rem Copyright (C) 2009-2010
+rem     Geoffrey Biggs
+rem     RT-Synthesis Research Group
+rem     Intelligent Systems Research Institute,
+rem     National Institute of Advanced Industrial Science and Technology (AIST),
+rem     Japan
+rem     All rights reserved.
+rem Licensed under the Eclipse Public License -v 1.0 (EPL)
+rem http://www.opensource.org/licenses/eclipse-1.0.txt
+
+rtstart.py %*
+
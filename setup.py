@@ -42,7 +42,9 @@ base_scripts = ['rtact',
                 'rtmgr',
                 'rtprint',
                 'rtpwd',
-                'rtreset']
+                'rtreset',
+                'rtsh',
+                'rtstart']
 if sys.platform == 'win32':
     batch_files = ['rtact.bat',
                    'rtcat.bat',
@@ -58,11 +60,13 @@ if sys.platform == 'win32':
                    'rtmgr.bat',
                    'rtprint.bat',
                    'rtpwd.bat',
-                   'rtreset.bat']
+                   'rtreset.bat',
+                   'rtsh.bat',
+                   'rtstart.bat']
     scripts = base_scripts + batch_files
     data_files = []
 else:
-    scripts = base_scripts + ['rtcwd']
+    scripts = base_scripts + ['rtcwd', 'rtshd']
     data_files = [('share/rtcshell', ['bash_completion'])]
 
 